@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from accounts import Account
+from connection_pool import transaction
+from database import read_account_versions, read_data_version
+from log_sink import write_log
+
+load_dotenv(override=True)
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("ACCOUNT_CACHE_FLUSH_SECONDS", "1.0"))
+MAX_ACCOUNTS = int(os.getenv("ACCOUNT_CACHE_MAX_ACCOUNTS", "256"))
+IDLE_SECONDS = float(os.getenv("ACCOUNT_CACHE_IDLE_SECONDS", "900"))
+
+
+class AccountCache:
+    """
+    Identity map of Account objects, with write-behind.
+
+    get() returns the same Account instance for a name until it is evicted, so repeated
+    tool calls don't re-read and re-validate the account. Account.save() only marks the
+    account dirty; dirty accounts are written together, in one transaction, by flush().
+    Accounts are evicted least-recently-used beyond max_accounts, or once idle for
+    idle_seconds, and are always flushed before they are dropped.
+
+    Other processes may write the same accounts (a reset, a notebook, another server).
+    Before each get(), and inside each flush's transaction, PRAGMA data_version shows whether
+    anything else has committed, and if so the cached accounts' versions are checked: an
+    account written elsewhere is dropped and read again. One with unsaved changes is read
+    again and has them re-applied on top (Account.rebase); if they no longer fit, they are
+    dropped, and the conflict is logged to the account's trader and counted.
+
+    All methods are meant to be called from the server's event loop, so tool calls and
+    flushes never interleave.
+    """
+
+    def __init__(self, max_accounts: int = MAX_ACCOUNTS, idle_seconds: float = IDLE_SECONDS):
+        self.max_accounts = max_accounts
+        self.idle_seconds = idle_seconds
+        self._accounts: OrderedDict[str, Account] = OrderedDict()
+        self._last_used: dict[str, float] = {}
+        self._dirty: dict[str, Account] = {}
+        self._data_version = None
+        self.conflicts = 0
+
+    def get(self, name: str) -> Account:
+        self.refresh()
+        key = name.lower()
+        account = self._accounts.get(key)
+        if account is None:
+            account = Account.get(key)
+            account.on_save(self.mark_dirty)
+            self._accounts[key] = account
+        else:
+            self._accounts.move_to_end(key)
+        self._last_used[key] = time.monotonic()
+        self._evict_overflow()
+        return account
+
+    def refresh(self) -> None:
+        """Catch up with the cached accounts that another connection has written since they were read."""
+        data_version = read_data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        if not self._accounts:
+            return
+        versions = read_account_versions(list(self._accounts))
+        for key, account in list(self._accounts.items()):
+            version = versions.get(key, account.version)
+            if version == account.version:
+                continue
+            if key not in self._dirty:
+                self._evict(key)
+            elif not account.rebase(Account.get(key)):
+                self.conflicts += 1
+                write_log(key, "account", "Changed elsewhere while it had unsaved changes that no longer fit; dropped them")
+                del self._dirty[key]
+                self._evict(key)
+
+    def mark_dirty(self, account: Account) -> None:
+        self._dirty[account.name.lower()] = account
+
+    def flush(self) -> int:
+        """Write every dirty account in a single transaction; return how many were written."""
+        if not self._dirty:
+            return 0
+        with transaction():
+            # Nothing else can commit until this transaction ends, so nothing written meanwhile is lost
+            self.refresh()
+            dirty = list(self._dirty.values())
+            for account in dirty:
+                account.persist()
+        self._dirty.clear()
+        return len(dirty)
+
+    def evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        for key in [key for key, used in self._last_used.items() if used < cutoff]:
+            self._evict(key)
+
+    def _evict_overflow(self) -> None:
+        while len(self._accounts) > self.max_accounts:
+            self._evict(next(iter(self._accounts)))
+
+    def _evict(self, key: str) -> None:
+        if key in self._dirty:
+            self._dirty[key].persist()
+            del self._dirty[key]
+        account = self._accounts.pop(key)
+        account.on_save(None)
+        self._last_used.pop(key, None)
+
+    async def run(self, interval: float = FLUSH_INTERVAL_SECONDS) -> None:
+        """Flush dirty accounts and evict idle ones every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+                self.evict_idle()
+            except Exception as e:
+                print(f"Error flushing account cache: {e}")
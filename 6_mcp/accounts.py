@@ -1,14 +1,29 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+from typing import Callable, Literal
 import json
+import math
+import os
+import numpy as np
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+import clock
+from market import NEW_YORK, get_share_price, get_share_prices, next_close
+from connection_pool import after_commit, transaction
+from database import write_account, read_account, read_transactions, read_ledger, write_order, read_orders, update_orders
+from ledger import Ledger, Position
+from log_sink import write_log
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# The account report sent to traders is trimmed to fit a rough token budget
+REPORT_TOKEN_BUDGET = int(os.getenv("REPORT_TOKEN_BUDGET", "1500"))
+REPORT_RECENT_TRANSACTIONS = int(os.getenv("REPORT_RECENT_TRANSACTIONS", "10"))
+REPORT_RATIONALE_CHARS = 120
+CHARS_PER_TOKEN = 4
+TRANSACTIONS_PAGE_SIZE = 50
 
 
 class Transaction(BaseModel):
@@ -25,13 +40,64 @@ class Transaction(BaseModel):
         return f"{abs(self.quantity)} shares of {self.symbol} at {self.price} each."
 
 
+class Order(BaseModel):
+    """
+    A limit or stop order, waiting to be matched against later prices.
+
+    A limit order fills once the price is at or better than its price: at or below it to
+    buy, at or above it to sell. A stop order fills once the price moves through its price:
+    at or above it to buy, at or below it to sell. Either way it fills as a market order at
+    the price that triggered it. Day orders expire at the next market close; good till
+    cancelled orders stay open until they fill or are cancelled.
+    """
+    id: int | None = None
+    name: str
+    symbol: str
+    side: Literal["buy", "sell"]
+    order_type: Literal["limit", "stop"]
+    quantity: int
+    price: float
+    good_till_cancelled: bool = False
+    expires_at: str | None = None
+    rationale: str = ""
+    created: str
+    status: Literal["open", "filled", "cancelled", "expired", "rejected"] = "open"
+    fill_price: float | None = None
+    updated: str | None = None
+    note: str | None = None
+
+    def triggered(self, market_price: float) -> bool:
+        rising = self.side == "buy" if self.order_type == "stop" else self.side == "sell"
+        return market_price >= self.price if rising else market_price <= self.price
+
+    def expired(self, now: str) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+    def __repr__(self):
+        tif = "good till cancelled" if self.good_till_cancelled else f"expires {self.expires_at}"
+        return f"#{self.id} {self.order_type} {self.side} {self.quantity} {self.symbol} at {self.price}, {tif}"
+
+
+class TradeLeg(BaseModel):
+    symbol: str
+    quantity: int  # positive to buy, negative to sell
+
+
 class Account(BaseModel):
     name: str
     balance: float
     strategy: str
     holdings: dict[str, int]
-    transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
+    transaction_count: int = 0
+    version: int = 0
+    _new_transactions: list[Transaction] = PrivateAttr(default_factory=list)
+    _pending_values: list[tuple[str, float]] = PrivateAttr(default_factory=list)
+    _written: tuple[int, int] = PrivateAttr(default=(0, 0))
+    _replace_history: bool = PrivateAttr(default=False)
+    _on_save: Callable[["Account"], None] | None = PrivateAttr(default=None)
+    _ledger: Ledger = PrivateAttr(default_factory=Ledger)
+    # The balance, holdings and strategy as last read or written, to tell this process's changes apart
+    _base: tuple[float, dict[str, int], str] | None = PrivateAttr(default=None)
 
     @classmethod
     def get(cls, name: str):
@@ -42,23 +108,116 @@ class Account(BaseModel):
                 "balance": INITIAL_BALANCE,
                 "strategy": "",
                 "holdings": {},
-                "transactions": [],
-                "portfolio_value_time_series": []
             }
-            write_account(name, fields)
-        return cls(**fields)
+            fields["version"] = write_account(name, fields["balance"], fields["strategy"], fields["holdings"])
+        account = cls(**fields)
+        stored = read_ledger(account.name)
+        if stored:
+            account._ledger = Ledger(positions={
+                symbol: Position(quantity=quantity, cost=cost, realized=realized)
+                for symbol, (quantity, cost, realized) in stored.items()
+            })
+        else:
+            account._ledger = Ledger.rebuild(account.all_transactions())
+        account._base = account._state()
+        return account
+
+    def _state(self) -> tuple[float, dict[str, int], str]:
+        return self.balance, dict(self.holdings), self.strategy
+
+    def rebase(self, current: "Account") -> bool:
+        """
+        Re-apply this account's unwritten changes on top of the account as another process has
+        since written it: the change in balance and in each holding, a new strategy, and the new
+        transactions. Returns False, changing nothing, if they no longer fit, e.g. the shares they
+        sell have been sold already. A pending reset overrides whatever was written.
+        """
+        if self._replace_history:
+            self.version = current.version
+            return True
+        base_balance, base_holdings, base_strategy = self._base or current._state()
+        balance = current.balance + self.balance - base_balance
+        holdings = dict(current.holdings)
+        for symbol in set(self.holdings) | set(base_holdings):
+            holdings[symbol] = holdings.get(symbol, 0) + self.holdings.get(symbol, 0) - base_holdings.get(symbol, 0)
+        if balance < 0 or any(quantity < 0 for quantity in holdings.values()):
+            return False
+        ledger = current._ledger
+        for transaction in self._new_transactions:
+            ledger.record(transaction.symbol, transaction.quantity, transaction.price)
+        self.balance = balance
+        self.holdings = {symbol: quantity for symbol, quantity in holdings.items() if quantity}
+        if self.strategy == base_strategy:
+            self.strategy = current.strategy
+        self.transaction_count = current.transaction_count + len(self._new_transactions)
+        self.version = current.version
+        self._ledger = ledger
+        self._base = current._state()
+        return True
     
     
     def save(self):
-        write_account(self.name.lower(), self.model_dump())
+        """ Persist the account now, or hand it to the owner's on_save hook (e.g. a write-behind cache). """
+        if self._on_save:
+            self._on_save(self)
+        else:
+            self.persist()
+
+    def on_save(self, callback: Callable[["Account"], None] | None):
+        """ Route save() through the callback instead of writing to the database. """
+        self._on_save = callback
+
+    def persist(self):
+        """
+        Write the account, appending only the transactions and values added since the last write.
+        They are dropped from memory once the enclosing transaction commits; if it rolls back,
+        the next persist() writes them again.
+        """
+        written_transactions, written_values = self._written
+        before = (self._written, self._replace_history, self.version, self._base)
+        self.version = write_account(
+            self.name.lower(),
+            self.balance,
+            self.strategy,
+            self.holdings,
+            [transaction.model_dump() for transaction in self._new_transactions[written_transactions:]],
+            self._pending_values[written_values:],
+            replace_history=self._replace_history,
+            ledger={
+                symbol: (position.quantity, position.cost, position.realized)
+                for symbol, position in self._ledger.positions.items()
+            },
+        )
+        self._written = (len(self._new_transactions), len(self._pending_values))
+        self._replace_history = False
+        self._base = self._state()
+        after_commit(self._forget_written, lambda: self._restore_written(*before))
+
+    def _forget_written(self):
+        written_transactions, written_values = self._written
+        del self._new_transactions[:written_transactions]
+        del self._pending_values[:written_values]
+        self._written = (0, 0)
+
+    def _restore_written(self, written: tuple[int, int], replace_history: bool, version: int, base):
+        self._written = written
+        self._replace_history = replace_history
+        self.version = version
+        self._base = base
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
         self.strategy = strategy
         self.holdings = {}
-        self.transactions = []
-        self.portfolio_value_time_series = []
+        self.transaction_count = 0
+        self._new_transactions = []
+        self._pending_values = []
+        self._written = (0, 0)
+        self._replace_history = True
+        self._ledger = Ledger()
         self.save()
+        now = clock.now().strftime(TIMESTAMP_FORMAT)
+        update_orders([(order.id, "cancelled", None, now, "account reset") for order in self.list_orders()])
 
     def deposit(self, amount: float):
         """ Deposit funds into the account. """
@@ -78,7 +237,18 @@ class Account(BaseModel):
 
     def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Buy shares of a stock if sufficient funds are available. """
-        price = get_share_price(symbol)
+        self.execute_buy(symbol, quantity, get_share_price(symbol), rationale)
+        return "Completed. Latest details:\n" + self.report()
+
+    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
+        """ Sell shares of a stock if the user has enough shares. """
+        if self.holdings.get(symbol, 0) < quantity:
+            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
+        self.execute_sell(symbol, quantity, get_share_price(symbol), rationale)
+        return "Completed. Latest details:\n" + self.report()
+
+    def execute_buy(self, symbol: str, quantity: int, price: float, rationale: str):
+        """ Buy at the given market price plus the spread. """
         buy_price = price * (1 + SPREAD)
         total_cost = buy_price * quantity
         
@@ -89,23 +259,23 @@ class Account(BaseModel):
         
         # Update holdings
         self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = clock.now().strftime(TIMESTAMP_FORMAT)
         # Record transaction
         transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
-        self.transactions.append(transaction)
+        self._new_transactions.append(transaction)
+        self.transaction_count += 1
+        self._ledger.record(symbol, quantity, buy_price)
         
         # Update balance
         self.balance -= total_cost
         self.save()
         write_log(self.name, "account", f"Bought {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
 
-    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
-        """ Sell shares of a stock if the user has enough shares. """
+    def execute_sell(self, symbol: str, quantity: int, price: float, rationale: str):
+        """ Sell at the given market price less the spread. """
         if self.holdings.get(symbol, 0) < quantity:
             raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
         
-        price = get_share_price(symbol)
         sell_price = price * (1 - SPREAD)
         total_proceeds = sell_price * quantity
         
@@ -115,28 +285,196 @@ class Account(BaseModel):
         # If shares are completely sold, remove from holdings
         if self.holdings[symbol] == 0:
             del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = clock.now().strftime(TIMESTAMP_FORMAT)
         # Record transaction
         transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
+        self._new_transactions.append(transaction)
+        self.transaction_count += 1
+        self._ledger.record(symbol, -quantity, sell_price)
 
         # Update balance
         self.balance += total_proceeds
         self.save()
         write_log(self.name, "account", f"Sold {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
 
-    def calculate_portfolio_value(self):
-        """ Calculate the total value of the user's portfolio. """
-        total_value = self.balance
-        for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
-        return total_value
+    def place_order(
+        self,
+        symbol: str,
+        side: str,
+        order_type: str,
+        quantity: int,
+        price: float,
+        rationale: str,
+        good_till_cancelled: bool = False,
+    ) -> Order:
+        """ Place a limit or stop order, to be filled by the order book when its price is reached. """
+        if quantity <= 0:
+            raise ValueError("Order quantity must be positive.")
+        if price <= 0:
+            raise ValueError("Order price must be positive.")
+        if side == "sell" and self.holdings.get(symbol, 0) < quantity:
+            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
+        now = clock.now()
+        expires_at = None
+        if not good_till_cancelled:
+            close = next_close(now.astimezone(NEW_YORK))
+            expires_at = close.astimezone().strftime(TIMESTAMP_FORMAT)
+        order = Order(
+            name=self.name.lower(),
+            symbol=symbol,
+            side=side,
+            order_type=order_type,
+            quantity=quantity,
+            price=price,
+            good_till_cancelled=good_till_cancelled,
+            expires_at=expires_at,
+            rationale=rationale,
+            created=now.strftime(TIMESTAMP_FORMAT),
+        )
+        order.id = write_order(order.model_dump())
+        write_log(self.name, "account", f"Placed order {order!r}")
+        return order
+
+    def list_orders(self, status: str | None = "open") -> list[Order]:
+        """ The account's orders with the given status (all orders if None), oldest first. """
+        return [Order(**order) for order in read_orders(self.name, status)]
+
+    def cancel_order(self, order_id: int) -> str:
+        """ Cancel one of the account's open orders. """
+        if not any(order.id == order_id for order in self.list_orders()):
+            raise ValueError(f"No open order {order_id} for {self.name}")
+        update_orders([(order_id, "cancelled", None, clock.now().strftime(TIMESTAMP_FORMAT), None)])
+        write_log(self.name, "account", f"Cancelled order #{order_id}")
+        return f"Cancelled order {order_id}"
+
+    def fill_order(self, order: Order, market_price: float):
+        """ Execute a triggered order at the market price; raises ValueError if it can't be filled. """
+        rationale = f"{order.order_type} order #{order.id}: {order.rationale}"
+        if order.side == "buy":
+            self.execute_buy(order.symbol, order.quantity, market_price, rationale)
+        else:
+            self.execute_sell(order.symbol, order.quantity, market_price, rationale)
+
+    def plan_rebalance(
+        self,
+        prices: dict[str, float],
+        target_weights: dict[str, float] | None = None,
+        legs: list[TradeLeg] | None = None,
+    ) -> list[TradeLeg]:
+        """
+        Turn target weights, or explicit legs, into legs that can all be executed at these prices:
+        sells first, then buys. Raises ValueError, changing nothing, if any leg can't be.
+        With target weights, holdings not mentioned are sold; the unallocated rest stays in cash.
+        Weights are of what the account would be worth after selling everything, net of the
+        spread, so that weights adding up to 1 can always be bought.
+        """
+        if (target_weights is None) == (legs is None):
+            raise ValueError("Give either target weights or trade legs (but not both).")
+        if target_weights is not None:
+            if any(weight < 0 for weight in target_weights.values()):
+                raise ValueError("Target weights can't be negative.")
+            if sum(target_weights.values()) > 1.0 + 1e-6:
+                raise ValueError("Target weights add up to more than 1.")
+            total = self.balance + sum(
+                quantity * prices.get(symbol, 0.0) * (1 - SPREAD) for symbol, quantity in self.holdings.items()
+            )
+            symbols = set(self.holdings) | set(target_weights)
+            legs = []
+            for symbol in sorted(symbols):
+                price = prices.get(symbol, 0.0)
+                if not price:
+                    raise ValueError(f"Unrecognized symbol {symbol}")
+                target = int(target_weights.get(symbol, 0.0) * total / (price * (1 + SPREAD)))
+                if target != self.holdings.get(symbol, 0):
+                    legs.append(TradeLeg(symbol=symbol, quantity=target - self.holdings.get(symbol, 0)))
+        legs = sorted((leg for leg in legs if leg.quantity), key=lambda leg: leg.quantity > 0)
+        holdings = dict(self.holdings)
+        balance = self.balance
+        for leg in legs:
+            price = prices.get(leg.symbol, 0.0)
+            if not price:
+                raise ValueError(f"Unrecognized symbol {leg.symbol}")
+            if leg.quantity < 0:
+                if holdings.get(leg.symbol, 0) < -leg.quantity:
+                    raise ValueError(f"Cannot sell {-leg.quantity} shares of {leg.symbol}. Not enough shares held.")
+                balance -= leg.quantity * price * (1 - SPREAD)
+            else:
+                balance -= leg.quantity * price * (1 + SPREAD)
+                if balance < 0:
+                    raise ValueError(f"Insufficient funds to buy {leg.quantity} shares of {leg.symbol}.")
+            holdings[leg.symbol] = holdings.get(leg.symbol, 0) + leg.quantity
+        return legs
+
+    def rebalance(
+        self,
+        rationale: str,
+        target_weights: dict[str, float] | None = None,
+        legs: list[TradeLeg] | None = None,
+    ) -> str:
+        """
+        Execute several trades as one: every leg is validated and priced with one lookup up
+        front, then all are applied and saved in a single transaction.
+        Returns a compact json summary of the trades and the resulting account.
+        """
+        symbols = set(self.holdings) | set(target_weights or {}) | {leg.symbol for leg in legs or []}
+        prices = get_share_prices(sorted(symbols))
+        legs = self.plan_rebalance(prices, target_weights, legs)
+        snapshot = self.snapshot()
+        try:
+            with transaction():
+                for leg in legs:
+                    if leg.quantity < 0:
+                        self.execute_sell(leg.symbol, -leg.quantity, prices[leg.symbol], rationale)
+                    else:
+                        self.execute_buy(leg.symbol, leg.quantity, prices[leg.symbol], rationale)
+                portfolio_value = self.calculate_portfolio_value(prices)
+                self._pending_values.append((clock.now().strftime(TIMESTAMP_FORMAT), portfolio_value))
+                self.save()
+        except BaseException:
+            # With a write-behind cache nothing was written yet, so rolling back alone would
+            # leave the legs applied in memory
+            self.restore(snapshot)
+            raise
+        write_log(self.name, "account", f"Rebalanced with {len(legs)} trades")
+        return json.dumps({
+            "trades": [
+                {"symbol": leg.symbol, "quantity": leg.quantity, "price": prices[leg.symbol]} for leg in legs
+            ],
+            "balance": self.balance,
+            "holdings": self.holdings,
+            "total_portfolio_value": portfolio_value,
+            "total_profit_loss": self.calculate_profit_loss(portfolio_value),
+        })
+
+    def snapshot(self) -> dict:
+        """The in-memory state a failed transaction must undo, for restore()."""
+        return {
+            "balance": self.balance,
+            "holdings": dict(self.holdings),
+            "transaction_count": self.transaction_count,
+            "_new_transactions": list(self._new_transactions),
+            "_pending_values": list(self._pending_values),
+            "_ledger": self._ledger.model_copy(deep=True),
+        }
+
+    def restore(self, snapshot: dict):
+        for field, value in snapshot.items():
+            setattr(self, field, value)
+
+    def calculate_portfolio_value(self, prices: dict[str, float] | None = None):
+        """ Calculate the total value of the user's portfolio, pricing all holdings in one lookup. """
+        if not self.holdings:
+            return self.balance
+        symbols = list(self.holdings)
+        prices = prices or get_share_prices(symbols)
+        quantities = np.array([self.holdings[symbol] for symbol in symbols], dtype=float)
+        share_prices = np.array([prices.get(symbol, 0.0) for symbol in symbols], dtype=float)
+        return self.balance + float(quantities @ share_prices)
 
     def calculate_profit_loss(self, portfolio_value: float):
-        """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        """ Calculate profit or loss from the initial spend: realized plus unrealized, from the ledger. """
+        holdings_value = portfolio_value - self.balance
+        return holdings_value - self._ledger.cost() + self._ledger.realized()
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -146,21 +484,96 @@ class Account(BaseModel):
         """ Report the user's profit or loss at any point in time. """
         return self.calculate_profit_loss()
 
+    def recent_transactions(self, limit: int, skip: int = 0) -> list[Transaction]:
+        """ Up to limit transactions, newest first, after skipping the skip most recent. """
+        unwritten = self._new_transactions[self._written[0]:]
+        unsaved = unwritten[::-1][skip:skip + limit]
+        if len(unsaved) == limit:
+            return unsaved
+        stored = read_transactions(self.name, limit - len(unsaved), max(0, skip - len(unwritten)))
+        return unsaved + [Transaction(**transaction) for transaction in stored]
+
+    def all_transactions(self) -> list[Transaction]:
+        """ The whole transaction history, oldest first. """
+        return self.recent_transactions(self.transaction_count)[::-1]
+
     def list_transactions(self):
         """ List all transactions made by the user. """
-        return [transaction.model_dump() for transaction in self.transactions]
+        return [transaction.model_dump() for transaction in self.all_transactions()]
     
-    def report(self) -> str:
-        """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
+    def average_costs(self) -> dict[str, float]:
+        """ Average cost per share of each holding, including the spread paid. """
+        return self._ledger.average_costs()
+
+    def realized_profit_loss(self) -> float:
+        return self._ledger.realized()
+
+    def check_ledger(self, repair: bool = False) -> list[str]:
+        """
+        Rebuild the ledger from the transaction log and list where the running ledger disagrees.
+        With repair, replace the running ledger with the rebuilt one and save it.
+        """
+        rebuilt = Ledger.rebuild(self.all_transactions())
+        differences = self._ledger.differences(rebuilt)
+        if differences and repair:
+            self._ledger = rebuilt
+            self.save()
+        return differences
+
+    def report(self, recent: int = REPORT_RECENT_TRANSACTIONS, token_budget: int = REPORT_TOKEN_BUDGET) -> str:
+        """
+        Return a compact json summary of the account: totals, each holding with its cost basis
+        and value, and the most recent transactions, trimmed to fit roughly token_budget tokens.
+        The full history is available a page at a time from transactions_page().
+        """
+        prices = get_share_prices(list(self.holdings)) if self.holdings else {}
+        portfolio_value = self.calculate_portfolio_value(prices)
+        self._pending_values.append((clock.now().strftime(TIMESTAMP_FORMAT), portfolio_value))
         self.save()
-        pnl = self.calculate_profit_loss(portfolio_value)
-        data = self.model_dump()
-        data["total_portfolio_value"] = portfolio_value
-        data["total_profit_loss"] = pnl
+        average_costs = self.average_costs()
+        holdings = {}
+        for symbol, quantity in self.holdings.items():
+            price = prices.get(symbol, 0.0)
+            average_cost = average_costs.get(symbol, 0.0)
+            holdings[symbol] = {
+                "quantity": quantity,
+                "average_cost": round(average_cost, 2),
+                "price": price,
+                "value": round(quantity * price, 2),
+                "unrealized_profit_loss": round(quantity * (price - average_cost), 2),
+            }
+        data = {
+            "name": self.name,
+            "balance": round(self.balance, 2),
+            "total_portfolio_value": round(portfolio_value, 2),
+            "total_profit_loss": round(self.calculate_profit_loss(portfolio_value), 2),
+            "holdings": holdings,
+            "transaction_count": self.transaction_count,
+        }
+        recent_transactions = [
+            {**t.model_dump(), "rationale": t.rationale[:REPORT_RATIONALE_CHARS]}
+            for t in (self.recent_transactions(recent)[::-1] if recent else [])
+        ]
+        while True:
+            data["recent_transactions"] = recent_transactions
+            text = json.dumps(data)
+            if len(text) <= token_budget * CHARS_PER_TOKEN or not recent_transactions:
+                break
+            recent_transactions = recent_transactions[1:]
         write_log(self.name, "account", f"Retrieved account details")
-        return json.dumps(data)
+        return text
+
+    def transactions_page(self, page: int = 1, page_size: int = TRANSACTIONS_PAGE_SIZE) -> str:
+        """ Return one page of the transaction history as json, newest first; page 1 is the latest. """
+        pages = max(1, math.ceil(self.transaction_count / page_size))
+        if not 1 <= page <= pages:
+            raise ValueError(f"Page must be between 1 and {pages}.")
+        transactions = self.recent_transactions(page_size, (page - 1) * page_size)
+        return json.dumps({
+            "page": page,
+            "pages": pages,
+            "transactions": [transaction.model_dump() for transaction in transactions],
+        })
     
     def get_strategy(self) -> str:
         """ Return the strategy of the account """
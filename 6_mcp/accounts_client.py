@@ -1,39 +1,199 @@
+import asyncio
+import os
+from datetime import timedelta
 import mcp
 from mcp.client.stdio import stdio_client
 from mcp import StdioServerParameters
 from agents import FunctionTool
+from agents.mcp import MCPServer
+from dotenv import load_dotenv
 import json
 
+load_dotenv(override=True)
+
 params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
 
+READ_TIMEOUT = timedelta(seconds=120)
+PING_TIMEOUT_SECONDS = 5
+IDLE_SECONDS = float(os.getenv("ACCOUNTS_CLIENT_IDLE_SECONDS", "60"))
+
+
+class AccountsClient:
+    """
+    One long-lived session with the accounts server, shared by every caller in the process.
+
+    The server is started on first use and MCP multiplexes concurrent requests over the one
+    session. Every call holds the session while it runs, and holders can keep it open across
+    calls with `async with client:`; the session closes idle_seconds after the last holder
+    leaves, or on close(). If a call fails because the server has died, the client
+    reconnects. Reads are then retried once, but tool calls are not: one that reached the
+    server may have taken effect, and running a trade twice is worse than reporting an error.
+
+    A process that already has an accounts server connected, like the trading floor's pool,
+    lends it with use_server(). Calls then go through that server, rather than a second one
+    with its own cache of the same accounts.
+
+    The session and its lock belong to the event loop that opened them; a call from a new
+    loop (e.g. a later asyncio.run) starts afresh.
+    """
+
+    def __init__(self, server_params: StdioServerParameters = params, idle_seconds: float = IDLE_SECONDS):
+        self.server_params = server_params
+        self.idle_seconds = idle_seconds
+        self._session: mcp.ClientSession | None = None
+        self._stop: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closer: asyncio.Task | None = None
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._holders = 0
+        self._server: MCPServer | None = None
+        self.reconnects = 0
+
+    def use_server(self, server: MCPServer | None) -> None:
+        """Send calls through this connected server (None to go back to starting our own)."""
+        self._server = server
+
+    async def __aenter__(self):
+        self._hold()
+        try:
+            await self._connect()
+        except BaseException:
+            self._release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._release()
+
+    async def close(self) -> None:
+        if self._closer is not None:
+            self._closer.cancel()
+            self._closer = None
+        async with self._bind():
+            await self._disconnect()
+
+    async def list_tools(self):
+        result = await self._call(lambda session: session.list_tools())
+        return result.tools
+
+    async def call_tool(self, tool_name, tool_args):
+        return await self._call(lambda session: session.call_tool(tool_name, tool_args), retry=False)
+
+    async def read_resource(self, uri: str) -> str:
+        result = await self._call(lambda session: session.read_resource(uri))
+        return result.contents[0].text
+
+    async def _call(self, request, retry: bool = True):
+        """Make a request, holding the session meanwhile; retry only says whether it is safe to repeat."""
+        self._hold()
+        try:
+            session = await self._connect()
+            try:
+                return await request(session)
+            except Exception:
+                if self._server is not None or await self._alive(session):
+                    raise
+                async with self._bind():
+                    if self._session is session:
+                        await self._disconnect()
+                        self.reconnects += 1
+                if not retry:
+                    raise
+            return await request(await self._connect())
+        finally:
+            self._release()
+
+    def _bind(self) -> asyncio.Lock:
+        """The lock for the running event loop; anything left over from an earlier loop is dropped."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._session = self._stop = self._task = self._closer = None
+            self._holders = 0
+        return self._lock
+
+    def _hold(self) -> None:
+        self._bind()
+        self._holders += 1
+        if self._closer is not None:
+            self._closer.cancel()
+            self._closer = None
+
+    def _release(self) -> None:
+        self._holders -= 1
+        if self._holders == 0 and self._task is not None:
+            self._closer = asyncio.create_task(self._close_when_idle())
+
+    async def _close_when_idle(self) -> None:
+        await asyncio.sleep(self.idle_seconds)
+        # From here on, a new holder waits for the close and then reconnects
+        self._closer = None
+        await self.close()
+
+    async def _connect(self) -> mcp.ClientSession:
+        if self._server is not None:
+            if self._server.session is None:
+                raise RuntimeError(f"The accounts server {self._server.name} is not connected")
+            return self._server.session
+        async with self._bind():
+            if self._session is None:
+                ready = asyncio.get_running_loop().create_future()
+                self._stop = asyncio.Event()
+                self._task = asyncio.create_task(self._serve(ready, self._stop))
+                await ready
+            return self._session
+
+    async def _serve(self, ready: asyncio.Future, stop: asyncio.Event) -> None:
+        """Own the stdio transport for its whole life, since it must be closed by the task that opened it."""
+        try:
+            async with stdio_client(self.server_params) as streams:
+                async with mcp.ClientSession(*streams, read_timeout_seconds=READ_TIMEOUT) as session:
+                    await session.initialize()
+                    self._session = session
+                    ready.set_result(None)
+                    await stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+
+    async def _disconnect(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await self._task
+        except BaseException as e:
+            print(f"Error closing accounts client: {e}")
+        self._session = None
+        self._task = None
+
+    async def _alive(self, session: mcp.ClientSession) -> bool:
+        try:
+            await asyncio.wait_for(session.send_ping(), PING_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+
+accounts_client = AccountsClient()
+
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
-        
+    return await accounts_client.list_tools()
+
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
-            
+    return await accounts_client.call_tool(tool_name, tool_args)
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
-        
+    return await accounts_client.read_resource(f"accounts://accounts_server/{name}")
+
+async def read_transactions_resource(name, page=1):
+    return await accounts_client.read_resource(f"accounts://transactions/{name}/{page}")
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    return await accounts_client.read_resource(f"accounts://strategy/{name}")
 
 async def get_accounts_tools_openai():
     openai_tools = []
@@ -44,7 +204,7 @@ async def get_accounts_tools_openai():
             description=tool.description,
             params_json_schema=schema,
             on_invoke_tool=lambda ctx, args, toolname=tool.name: call_accounts_tool(toolname, json.loads(args))
-                
+
         )
         openai_tools.append(openai_tool)
-    return openai_tools
\ No newline at end of file
+    return openai_tools
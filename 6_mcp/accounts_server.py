@@ -1,27 +1,58 @@
+import asyncio
+import atexit
+import signal
+import sys
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
-from accounts import Account
+from mcp.types import ToolAnnotations
+from account_cache import AccountCache
+from accounts import TradeLeg
+from order_book import OrderBook
 
-mcp = FastMCP("accounts_server")
+accounts = AccountCache()
+orders = OrderBook(accounts)
+atexit.register(accounts.flush)
+# MCP clients stop stdio servers with SIGTERM; exit cleanly so pending writes are flushed
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
-@mcp.tool()
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    flusher = asyncio.create_task(accounts.run())
+    matcher = asyncio.create_task(orders.run())
+    try:
+        yield
+    finally:
+        matcher.cancel()
+        flusher.cancel()
+        accounts.flush()
+
+
+mcp = FastMCP("accounts_server", lifespan=lifespan)
+
+# Read-only tools can be memoized by clients within a run; any other call invalidates the account's reads
+READ_ONLY = ToolAnnotations(readOnlyHint=True)
+WRITE = ToolAnnotations(readOnlyHint=False)
+
+@mcp.tool(annotations=READ_ONLY)
 async def get_balance(name: str) -> float:
     """Get the cash balance of the given account name.
 
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).balance
+    return accounts.get(name).balance
 
-@mcp.tool()
+@mcp.tool(annotations=READ_ONLY)
 async def get_holdings(name: str) -> dict[str, int]:
     """Get the holdings of the given account name.
 
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).holdings
+    return accounts.get(name).holdings
 
-@mcp.tool()
+@mcp.tool(annotations=WRITE)
 async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
     """Buy shares of a stock.
 
@@ -31,10 +62,10 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
         quantity: The quantity of shares to buy
         rationale: The rationale for the purchase and fit with the account's strategy
     """
-    return Account.get(name).buy_shares(symbol, quantity, rationale)
+    return accounts.get(name).buy_shares(symbol, quantity, rationale)
 
 
-@mcp.tool()
+@mcp.tool(annotations=WRITE)
 async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
     """Sell shares of a stock.
 
@@ -44,9 +75,90 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
         quantity: The quantity of shares to sell
         rationale: The rationale for the sale and fit with the account's strategy
     """
-    return Account.get(name).sell_shares(symbol, quantity, rationale)
+    return accounts.get(name).sell_shares(symbol, quantity, rationale)
+
+@mcp.tool(annotations=WRITE)
+async def rebalance(
+    name: str,
+    rationale: str,
+    target_weights: dict[str, float] | None = None,
+    trades: list[TradeLeg] | None = None,
+) -> str:
+    """Make several trades at once, all or nothing. Prefer this to many buy_shares and sell_shares calls.
+
+    Give either target_weights, the fraction of the portfolio's total value to hold in each
+    symbol (holdings not listed are sold, the rest stays in cash), or trades, a list of
+    symbols and quantities (positive to buy, negative to sell). Sells are made before buys.
+
+    Args:
+        name: The name of the account holder
+        rationale: The rationale for the rebalance and fit with the account's strategy
+        target_weights: e.g. {"AAPL": 0.3, "MSFT": 0.2}
+        trades: e.g. [{"symbol": "AAPL", "quantity": 10}, {"symbol": "TSLA", "quantity": -5}]
+    """
+    return accounts.get(name).rebalance(rationale, target_weights, trades)
+
+@mcp.tool(annotations=WRITE)
+async def place_order(
+    name: str,
+    symbol: str,
+    side: str,
+    order_type: str,
+    quantity: int,
+    price: float,
+    rationale: str,
+    good_till_cancelled: bool = False,
+) -> str:
+    """Place a limit or stop order, which is filled automatically once the market reaches its price.
+
+    A limit order buys at or below its price, or sells at or above it. A stop order buys once
+    the price rises to it, or sells once the price falls to it (e.g. a stop loss).
+    Orders expire at the next market close unless they are good till cancelled.
+
+    Args:
+        name: The name of the account holder
+        symbol: The symbol of the stock
+        side: "buy" or "sell"
+        order_type: "limit" or "stop"
+        quantity: The quantity of shares
+        price: The limit or stop price
+        rationale: The rationale for the order and fit with the account's strategy
+        good_till_cancelled: Keep the order open past today's close until it fills or is cancelled
+    """
+    order = accounts.get(name).place_order(symbol, side, order_type, quantity, price, rationale, good_till_cancelled)
+    return f"Placed order {order!r}"
+
+@mcp.tool(annotations=READ_ONLY)
+async def list_orders(name: str) -> list[dict]:
+    """List the open limit and stop orders of the given account name.
 
-@mcp.tool()
+    Args:
+        name: The name of the account holder
+    """
+    return [order.model_dump() for order in accounts.get(name).list_orders()]
+
+@mcp.tool(annotations=WRITE)
+async def cancel_order(name: str, order_id: int) -> str:
+    """Cancel an open order.
+
+    Args:
+        name: The name of the account holder
+        order_id: The id of the order to cancel
+    """
+    return accounts.get(name).cancel_order(order_id)
+
+@mcp.tool(annotations=READ_ONLY)
+async def list_transactions(name: str, page: int = 1) -> str:
+    """List the account's transactions, newest first, one page of 50 at a time.
+    Your account report only includes the most recent transactions.
+
+    Args:
+        name: The name of the account holder
+        page: The page to return; page 1 is the most recent
+    """
+    return accounts.get(name).transactions_page(page)
+
+@mcp.tool(annotations=WRITE)
 async def change_strategy(name: str, strategy: str) -> str:
     """At your discretion, if you choose to, call this to change your investment strategy for the future.
 
@@ -54,16 +166,20 @@ async def change_strategy(name: str, strategy: str) -> str:
         name: The name of the account holder
         strategy: The new strategy for the account
     """
-    return Account.get(name).change_strategy(strategy)
+    return accounts.get(name).change_strategy(strategy)
 
 @mcp.resource("accounts://accounts_server/{name}")
 async def read_account_resource(name: str) -> str:
-    account = Account.get(name.lower())
+    account = accounts.get(name)
     return account.report()
 
+@mcp.resource("accounts://transactions/{name}/{page}")
+async def read_transactions_resource(name: str, page: str) -> str:
+    return accounts.get(name).transactions_page(int(page))
+
 @mcp.resource("accounts://strategy/{name}")
 async def read_strategy_resource(name: str) -> str:
-    account = Account.get(name.lower())
+    account = accounts.get(name)
     return account.get_strategy()
 
 if __name__ == "__main__":
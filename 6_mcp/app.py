@@ -1,10 +1,14 @@
 import gradio as gr
+from collections import deque
+from datetime import timedelta
 from util import css, js, Color
 import pandas as pd
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log
+from database import read_log_since, read_portfolio_values
+from event_bus import LOGS, DatabaseWatcher, bus
+from span_stats import span_percentiles
 
 mapper = {
     "trace": Color.WHITE,
@@ -13,6 +17,16 @@ mapper = {
     "generation": Color.YELLOW,
     "response": Color.MAGENTA,
     "account": Color.RED,
+    "research": Color.BLUE,
+}
+
+LOG_LINES = 13
+
+ZOOM_WINDOWS = {
+    "1D": timedelta(days=1),
+    "1W": timedelta(weeks=1),
+    "3M": timedelta(days=90),
+    "All": None,
 }
 
 
@@ -22,6 +36,9 @@ class Trader:
         self.lastname = lastname
         self.model_name = model_name
         self.account = Account.get(name)
+        self.log_lines = deque(maxlen=LOG_LINES)
+        self.last_log_id = 0
+        self.logs_html = self.render_logs()
 
     def reload(self):
         self.account = Account.get(self.name)
@@ -32,13 +49,14 @@ class Trader:
     def get_strategy(self) -> str:
         return self.account.get_strategy()
 
-    def get_portfolio_value_df(self) -> pd.DataFrame:
-        df = pd.DataFrame(self.account.portfolio_value_time_series, columns=["datetime", "value"])
+    def get_portfolio_value_df(self, zoom: str = "All") -> pd.DataFrame:
+        values = read_portfolio_values(self.name, ZOOM_WINDOWS[zoom])
+        df = pd.DataFrame(values, columns=["datetime", "value"])
         df["datetime"] = pd.to_datetime(df["datetime"])
         return df
 
-    def get_portfolio_value_chart(self):
-        df = self.get_portfolio_value_df()
+    def get_portfolio_value_chart(self, zoom: str = "All"):
+        df = self.get_portfolio_value_df(zoom)
         fig = px.line(df, x="datetime", y="value")
         margin = dict(l=40, r=20, t=20, b=40)
         fig.update_layout(
@@ -49,7 +67,8 @@ class Trader:
             paper_bgcolor="#bbb",
             plot_bgcolor="#dde",
         )
-        fig.update_xaxes(tickformat="%m/%d", tickangle=45, tickfont=dict(size=8))
+        tickformat = "%H:%M" if zoom == "1D" else "%m/%d"
+        fig.update_xaxes(tickformat=tickformat, tickangle=45, tickfont=dict(size=8))
         fig.update_yaxes(tickfont=dict(size=8), tickformat=",.0f")
         return fig
 
@@ -80,16 +99,20 @@ class Trader:
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
 
+    def render_logs(self) -> str:
+        return f"<div style='height:250px; overflow-y:auto;'>{''.join(self.log_lines)}</div>"
+
     def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
-        response = ""
-        for log in logs:
-            timestamp, type, message = log
+        """Fetch only the log entries written since the last call, re-rendering if there are any"""
+        logs = read_log_since(self.name, self.last_log_id, limit=LOG_LINES)
+        for log_id, timestamp, type, message in logs:
             color = mapper.get(type, Color.WHITE).value
-            response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
-        response = f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
-        if response != previous:
-            return response
+            self.log_lines.append(f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>")
+            self.last_log_id = log_id
+        if logs:
+            self.logs_html = self.render_logs()
+        if self.logs_html != previous:
+            return self.logs_html
         return gr.update()
 
 
@@ -98,14 +121,20 @@ class TraderView:
         self.trader = trader
         self.portfolio_value = None
         self.chart = None
+        self.zoom = None
         self.holdings_table = None
         self.transactions_table = None
+        self.version = None
 
     def make_ui(self):
         with gr.Column():
             gr.HTML(self.trader.get_title())
             with gr.Row():
                 self.portfolio_value = gr.HTML(self.trader.get_portfolio_value)
+            with gr.Row():
+                self.zoom = gr.Radio(
+                    list(ZOOM_WINDOWS), value="All", show_label=False, container=False
+                )
             with gr.Row():
                 self.chart = gr.Plot(
                     self.trader.get_portfolio_value_chart, container=True, show_label=False
@@ -132,11 +161,17 @@ class TraderView:
                     max_height=300,
                     elem_classes=["dataframe-fix"],
                 )
+            self.version = gr.Number(value=0, visible=False)
 
-        timer = gr.Timer(value=120)
-        timer.tick(
+        self.zoom.change(
+            fn=self.trader.get_portfolio_value_chart,
+            inputs=[self.zoom],
+            outputs=[self.chart],
+            show_progress="hidden",
+        )
+        self.version.change(
             fn=self.refresh,
-            inputs=[],
+            inputs=[self.zoom],
             outputs=[
                 self.portfolio_value,
                 self.chart,
@@ -144,27 +179,72 @@ class TraderView:
                 self.transactions_table,
             ],
             show_progress="hidden",
-            queue=False,
-        )
-        log_timer = gr.Timer(value=0.5)
-        log_timer.tick(
-            fn=self.trader.get_logs,
-            inputs=[self.log],
-            outputs=[self.log],
-            show_progress="hidden",
-            queue=False,
         )
 
-    def refresh(self):
+    async def stream(self):
+        """
+        Push changes to the browser as they happen: new log lines directly, and account changes
+        by bumping the hidden version number, whose change handler re-renders with the chosen zoom.
+        """
+        version = 0
+        async for topic in bus.subscribe(self.trader.name):
+            if topic == LOGS:
+                yield self.trader.get_logs(), gr.update()
+            else:
+                version += 1
+                yield gr.update(), version
+
+    def refresh(self, zoom: str = "All"):
         self.trader.reload()
         return (
             self.trader.get_portfolio_value(),
-            self.trader.get_portfolio_value_chart(),
+            self.trader.get_portfolio_value_chart(zoom),
             self.trader.get_holdings_df(),
             self.trader.get_transactions_df(),
         )
 
 
+class SpanView:
+    """Where the traders' time goes: latency percentiles and total time per tool and per model."""
+
+    def __init__(self):
+        self.zoom = None
+        self.tools_table = None
+        self.models_table = None
+        self.chart = None
+
+    def get_stats(self, zoom: str = "1D"):
+        tools = span_percentiles("tool", ZOOM_WINDOWS[zoom])
+        models = span_percentiles("model", ZOOM_WINDOWS[zoom])
+        totals = pd.concat([tools.assign(Kind="tool"), models.assign(Kind="model")])
+        fig = px.bar(totals, x="Total s", y="Name", color="Kind", orientation="h")
+        fig.update_layout(
+            height=300,
+            margin=dict(l=40, r=20, t=20, b=40),
+            yaxis_title=None,
+            yaxis=dict(categoryorder="total ascending"),
+            paper_bgcolor="#bbb",
+            plot_bgcolor="#dde",
+        )
+        fig.update_yaxes(tickfont=dict(size=8))
+        return tools, models, fig
+
+    def make_ui(self):
+        with gr.Accordion("Where the time goes", open=False):
+            with gr.Row():
+                self.zoom = gr.Radio(list(ZOOM_WINDOWS), value="1D", show_label=False, container=False)
+                refresh = gr.Button("Refresh", size="sm")
+            with gr.Row():
+                self.chart = gr.Plot(container=True, show_label=False)
+            with gr.Row():
+                self.tools_table = gr.Dataframe(label="Tools", max_height=300, elem_classes=["dataframe-fix-small"])
+                self.models_table = gr.Dataframe(label="Models", max_height=300, elem_classes=["dataframe-fix-small"])
+        outputs = [self.tools_table, self.models_table, self.chart]
+        self.zoom.change(fn=self.get_stats, inputs=[self.zoom], outputs=outputs, show_progress="hidden")
+        refresh.click(fn=self.get_stats, inputs=[self.zoom], outputs=outputs, show_progress="hidden")
+        return outputs
+
+
 # Main UI construction
 def create_ui():
     """Create the main Gradio UI for the trading simulation"""
@@ -174,6 +254,7 @@ def create_ui():
         for trader_name, lastname, model_name in zip(names, lastnames, short_model_names)
     ]
     trader_views = [TraderView(trader) for trader in traders]
+    DatabaseWatcher(bus).start()
 
     with gr.Blocks(
         title="Traders", css=css, js=js, theme=gr.themes.Default(primary_hue="sky"), fill_width=True
@@ -181,6 +262,16 @@ def create_ui():
         with gr.Row():
             for trader_view in trader_views:
                 trader_view.make_ui()
+        span_view = SpanView()
+        span_outputs = span_view.make_ui()
+        ui.load(span_view.get_stats, inputs=[span_view.zoom], outputs=span_outputs, show_progress="hidden")
+        for trader_view in trader_views:
+            ui.load(
+                trader_view.stream,
+                outputs=[trader_view.log, trader_view.version],
+                show_progress="hidden",
+                concurrency_limit=None,
+            )
 
     return ui
 
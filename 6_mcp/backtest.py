@@ -0,0 +1,314 @@
+"""
+Replay the traders against historical prices, faster than real time and without API costs.
+
+    uv run backtest.py prices.csv [--cycles-per-day 1] [--output equity.csv]
+
+The price file is a CSV with date, symbol and close columns. It is loaded
+into the market table of a separate backtest database. A simulated clock then steps
+through its dates. Each trader runs through the usual Agent and Runner code, but with a
+scripted model in place of the LLM and the accounts and market MCP servers called in
+process. The result is a per-trader equity curve.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable
+import pandas as pd
+from agents import Agent, Model, ModelResponse, Usage, set_tracing_disabled
+from agents.mcp import MCPServer
+from mcp.server.fastmcp import FastMCP
+from mcp.types import CallToolResult, TextContent
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+)
+import clock
+import market
+from accounts import SPREAD
+from accounts_server import accounts, orders, mcp as accounts_mcp, read_account_resource, read_strategy_resource
+from market_server import mcp as market_mcp
+from reset import reset_traders
+from connection_pool import transaction
+from database import use_database, write_market, read_market
+from templates import trader_instructions
+from traders import Trader
+from trading_floor import names, lastnames
+
+BACKTEST_DB = "backtest.db"
+MARKET_OPEN = timedelta(hours=9, minutes=30)
+TRADING_HOURS = timedelta(hours=6, minutes=30)
+
+Policy = Callable[[dict[str, int], float, pd.DataFrame], list[tuple[str, dict]]]
+
+
+class HistoricalPrices:
+    """Daily closing prices from a CSV file, served from the market table by simulated date."""
+
+    def __init__(self, path: str):
+        frame = pd.read_csv(path)
+        frame.columns = [column.lower() for column in frame.columns]
+        frame["date"] = pd.to_datetime(frame["date"]).dt.strftime("%Y-%m-%d")
+        self.closes = frame.pivot_table(index="date", columns="symbol", values="close").sort_index()
+        self.dates = list(self.closes.index)
+        self.prices_on = lru_cache(maxsize=8)(self._prices_on)
+
+    def load_into_market(self) -> None:
+        with transaction():
+            for date, row in self.closes.iterrows():
+                write_market(date, row.dropna().to_dict())
+
+    @staticmethod
+    def _prices_on(date: str) -> dict[str, float]:
+        return read_market(date) or {}
+
+    def feed(self, symbols: list[str]) -> dict[str, float]:
+        prices = self.prices_on(clock.now().strftime("%Y-%m-%d"))
+        return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+
+    def history(self) -> pd.DataFrame:
+        """Closes up to and including the simulated date, so policies can't see the future."""
+        return self.closes.loc[: clock.now().strftime("%Y-%m-%d")]
+
+
+class InProcessMCPServer(MCPServer):
+    """Serves a FastMCP server's tools directly, standing in for an MCPServerStdio subprocess."""
+
+    def __init__(self, server: FastMCP):
+        self.server = server
+
+    async def connect(self):
+        pass
+
+    @property
+    def name(self) -> str:
+        return self.server.name
+
+    async def cleanup(self):
+        pass
+
+    async def list_tools(self):
+        return await self.server.list_tools()
+
+    async def call_tool(self, tool_name, arguments) -> CallToolResult:
+        try:
+            content = await self.server.call_tool(tool_name, arguments or {})
+            return CallToolResult(content=list(content))
+        except Exception as e:
+            return CallToolResult(content=[TextContent(type="text", text=str(e))], isError=True)
+
+
+class ScriptedModel(Model):
+    """
+    Stands in for the LLM. On its first turn it calls the tools chosen by a policy, and once
+    the tool results come back it ends the run with a one-line summary.
+    """
+
+    def __init__(self, name: str, policy: Policy, prices: HistoricalPrices):
+        self.name = name
+        self.policy = policy
+        self.prices = prices
+        self.ids = itertools.count()
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs):
+        if isinstance(input, list) and any(item.get("type") == "function_call_output" for item in input):
+            return self.reply("Trades executed.")
+        account = accounts.get(self.name)
+        calls = self.policy(dict(account.holdings), account.balance, self.prices.history())
+        if not calls:
+            return self.reply("No trades this cycle.")
+        output = [
+            ResponseFunctionToolCall(
+                id=f"fc_{next(self.ids)}",
+                call_id=f"call_{next(self.ids)}",
+                name=tool,
+                arguments=json.dumps({"name": self.name, **args}),
+                type="function_call",
+                status="completed",
+            )
+            for tool, args in calls
+        ]
+        return ModelResponse(output=output, usage=Usage(), response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs):
+        """The same response as get_response, streamed as a single completed event."""
+        response = await self.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+        )
+        yield ResponseCompletedEvent(
+            type="response.completed",
+            sequence_number=0,
+            response=Response(
+                id=f"resp_{next(self.ids)}",
+                created_at=time.time(),
+                model="scripted",
+                object="response",
+                output=response.output,
+                parallel_tool_calls=True,
+                tool_choice="auto",
+                tools=[],
+            ),
+        )
+
+    def reply(self, text: str) -> ModelResponse:
+        message = ResponseOutputMessage(
+            id=f"msg_{next(self.ids)}",
+            content=[ResponseOutputText(text=text, type="output_text", annotations=[])],
+            role="assistant",
+            status="completed",
+            type="message",
+        )
+        return ModelResponse(output=[message], usage=Usage(), response_id=None)
+
+
+def affordable(cash: float, price: float) -> int:
+    return int(cash / (price * (1 + SPREAD))) if price else 0
+
+
+def buy_and_hold(holdings, balance, history, picks=5) -> list[tuple[str, dict]]:
+    """Spread the cash over the first few symbols once, then never trade again."""
+    if holdings or history.empty:
+        return []
+    today = history.iloc[-1].dropna()
+    symbols = list(today.index[:picks])
+    calls = []
+    for symbol in symbols:
+        quantity = affordable(balance / len(symbols), today[symbol])
+        if quantity:
+            calls.append(("buy_shares", {"symbol": symbol, "quantity": quantity, "rationale": "buy and hold"}))
+    return calls
+
+
+def momentum(holdings, balance, history, lookback=20, fraction=0.25) -> list[tuple[str, dict]]:
+    """Sell holdings that have fallen over the lookback, and buy the strongest riser."""
+    if len(history) <= lookback:
+        return []
+    returns = (history.iloc[-1] / history.iloc[-1 - lookback] - 1).dropna()
+    calls = [
+        ("sell_shares", {"symbol": symbol, "quantity": quantity, "rationale": "momentum turned negative"})
+        for symbol, quantity in holdings.items()
+        if returns.get(symbol, 0.0) < 0
+    ]
+    if not returns.empty and returns.max() > 0:
+        best = returns.idxmax()
+        quantity = affordable(balance * fraction, history.iloc[-1][best])
+        if quantity:
+            calls.append(("buy_shares", {"symbol": best, "quantity": quantity, "rationale": "strongest momentum"}))
+    return calls
+
+
+def mean_reversion(holdings, balance, history, lookback=5, fraction=0.2) -> list[tuple[str, dict]]:
+    """Take profits on holdings that have risen over the lookback, and buy the biggest faller."""
+    if len(history) <= lookback:
+        return []
+    returns = (history.iloc[-1] / history.iloc[-1 - lookback] - 1).dropna()
+    calls = [
+        ("sell_shares", {"symbol": symbol, "quantity": quantity, "rationale": "reverting after a rise"})
+        for symbol, quantity in holdings.items()
+        if returns.get(symbol, 0.0) > 0.05
+    ]
+    if not returns.empty and returns.min() < 0:
+        worst = returns.idxmin()
+        quantity = affordable(balance * fraction, history.iloc[-1][worst])
+        if quantity:
+            calls.append(("buy_shares", {"symbol": worst, "quantity": quantity, "rationale": "oversold"}))
+    return calls
+
+
+POLICIES: dict[str, Policy] = {
+    "Warren": buy_and_hold,
+    "George": momentum,
+    "Ray": mean_reversion,
+    "Cathie": lambda holdings, balance, history: momentum(holdings, balance, history, lookback=5, fraction=0.5),
+}
+
+
+class BacktestTrader(Trader):
+    """A Trader whose model is scripted and whose account is read in process."""
+
+    def __init__(self, name: str, lastname: str, policy: Policy, prices: HistoricalPrices):
+        super().__init__(name, lastname, model_name="scripted")
+        self.model = ScriptedModel(name, policy, prices)
+
+    async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
+        self.agent = Agent(
+            name=self.name,
+            instructions=trader_instructions(self.name),
+            model=self.model,
+            mcp_servers=trader_mcp_servers,
+        )
+        return self.agent
+
+    async def get_account_report(self, accounts_server=None) -> str:
+        return await read_account_resource(self.name)
+
+    async def get_strategy(self, accounts_server=None) -> str:
+        return await read_strategy_resource(self.name)
+
+
+async def run_backtest(path: str, cycles_per_day: int = 1, database: str = BACKTEST_DB) -> pd.DataFrame:
+    """Replay every date in the price file and return each trader's portfolio value after every cycle."""
+    set_tracing_disabled(True)
+    use_database(database)
+    prices = HistoricalPrices(path)
+    prices.load_into_market()
+    market.use_price_feed(prices.feed)
+    simulated = clock.SimulatedClock(datetime.fromisoformat(prices.dates[0]) + MARKET_OPEN)
+    clock.use_clock(simulated)
+    reset_traders()
+    servers = [InProcessMCPServer(accounts_mcp), InProcessMCPServer(market_mcp)]
+    traders = [
+        BacktestTrader(name, lastname, POLICIES[name], prices) for name, lastname in zip(names, lastnames)
+    ]
+    step = TRADING_HOURS / cycles_per_day
+    equity = []
+    try:
+        for date in prices.dates:
+            for cycle in range(cycles_per_day):
+                simulated.current = datetime.fromisoformat(date) + MARKET_OPEN + step * cycle
+                orders.match()
+                await asyncio.gather(*[trader.run_agent(servers, []) for trader in traders])
+                for trader in traders:
+                    trader.do_trade = not trader.do_trade
+                accounts.flush()
+                values = {trader.name: accounts.get(trader.name).calculate_portfolio_value() for trader in traders}
+                equity.append({"datetime": simulated.current, **values})
+    finally:
+        accounts.flush()
+        market.use_price_feed(None)
+        clock.use_clock(None)
+    return pd.DataFrame(equity).set_index("datetime")
+
+
+def summarize(equity: pd.DataFrame) -> pd.DataFrame:
+    drawdown = equity / equity.cummax() - 1
+    return pd.DataFrame(
+        {
+            "final value": equity.iloc[-1],
+            "return %": (equity.iloc[-1] / equity.iloc[0] - 1) * 100,
+            "max drawdown %": drawdown.min() * 100,
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the traders against historical prices")
+    parser.add_argument("prices", help="CSV file with date, symbol and close columns")
+    parser.add_argument("--cycles-per-day", type=int, default=1)
+    parser.add_argument("--output", help="Write the equity curves to this CSV file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    equity = asyncio.run(run_backtest(args.prices, args.cycles_per_day))
+    elapsed = time.perf_counter() - start
+    print(f"{len(equity)} cycles in {elapsed:.1f}s ({len(equity) / elapsed * 60:,.0f} cycles per minute)")
+    print(summarize(equity).round(2))
+    if args.output:
+        equity.to_csv(args.output)
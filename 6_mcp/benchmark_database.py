@@ -0,0 +1,108 @@
+"""
+Microbenchmark: ops/sec of the pooled database layer vs. a fresh connection per call.
+
+Runs against a throwaway database in a temp directory, so it is safe to run alongside
+the trading floor:
+
+    uv run benchmark_database.py [iterations]
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import time
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+workdir = tempfile.mkdtemp(prefix="bench_db_")
+os.chdir(workdir)
+
+import database  # noqa: E402  (creates the schema in the temp directory)
+
+LEGACY_DB = "legacy.db"
+
+with sqlite3.connect(LEGACY_DB) as conn:
+    conn.execute("CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS logs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, datetime DATETIME, type TEXT, message TEXT)"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)")
+
+
+def legacy_write_account(name, account_dict):
+    with sqlite3.connect(LEGACY_DB) as conn:
+        conn.execute(
+            "INSERT INTO accounts (name, account) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET account=excluded.account",
+            (name.lower(), json.dumps(account_dict)),
+        )
+        conn.commit()
+
+
+def legacy_read_account(name):
+    with sqlite3.connect(LEGACY_DB) as conn:
+        row = conn.execute("SELECT account FROM accounts WHERE name = ?", (name.lower(),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def legacy_write_log(name, type, message):
+    with sqlite3.connect(LEGACY_DB) as conn:
+        conn.execute(
+            "INSERT INTO logs (name, datetime, type, message) VALUES (?, datetime('now'), ?, ?)",
+            (name.lower(), type, message),
+        )
+        conn.commit()
+
+
+def legacy_read_log(name, last_n=10):
+    with sqlite3.connect(LEGACY_DB) as conn:
+        rows = conn.execute(
+            "SELECT datetime, type, message FROM logs WHERE name = ? ORDER BY datetime DESC LIMIT ?",
+            (name.lower(), last_n),
+        ).fetchall()
+        return reversed(rows)
+
+
+def legacy_write_market(date, data):
+    with sqlite3.connect(LEGACY_DB) as conn:
+        conn.execute(
+            "INSERT INTO market (date, data) VALUES (?, ?) ON CONFLICT(date) DO UPDATE SET data=excluded.data",
+            (date, json.dumps(data)),
+        )
+        conn.commit()
+
+
+def legacy_read_market(date):
+    with sqlite3.connect(LEGACY_DB) as conn:
+        row = conn.execute("SELECT data FROM market WHERE date = ?", (date,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+ACCOUNT = {"name": "warren", "balance": 10_000.0, "strategy": "value", "holdings": {"AAPL": 10}}
+MARKET = {f"SYM{i}": float(i) for i in range(100)}
+
+CASES = [
+    ("write_account", lambda i: database.write_account("warren", 10_000.0, "value", {"AAPL": 10}), lambda i: legacy_write_account("warren", ACCOUNT)),
+    ("read_account", lambda i: database.read_account("warren"), lambda i: legacy_read_account("warren")),
+    ("write_log", lambda i: database.write_log("warren", "bench", f"message {i}"), lambda i: legacy_write_log("warren", "bench", f"message {i}")),
+    ("read_log", lambda i: list(database.read_log("warren", 13)), lambda i: list(legacy_read_log("warren", 13))),
+    ("write_market", lambda i: database.write_market("2025-01-01", MARKET), lambda i: legacy_write_market("2025-01-01", MARKET)),
+    ("read_market", lambda i: database.read_market("2025-01-01"), lambda i: legacy_read_market("2025-01-01")),
+]
+
+
+def ops_per_second(fn) -> float:
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(i)
+    return ITERATIONS / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print(f"{ITERATIONS} iterations per case in {workdir}\n")
+    print(f"{'operation':<15}{'legacy ops/s':>15}{'pooled ops/s':>15}{'speedup':>10}")
+    for label, pooled, legacy in CASES:
+        legacy_rate = ops_per_second(legacy)
+        pooled_rate = ops_per_second(pooled)
+        print(f"{label:<15}{legacy_rate:>15,.0f}{pooled_rate:>15,.0f}{pooled_rate / legacy_rate:>9.1f}x")
@@ -0,0 +1,100 @@
+"""
+Benchmark: recall latency of the native memory server vs. the mcp-memory-libsql server.
+
+Both servers are started over stdio, as the researcher starts them, loaded with the same
+synthetic knowledge graph, and asked the same search_nodes queries. Runs against
+throwaway stores in a temp directory:
+
+    uv run benchmark_memory.py [entities] [queries]
+
+The libsql server needs npx; without it, only the native server is measured.
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from agents.mcp import MCPServerStdio
+
+ENTITIES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+BATCH = 50
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG", "META", "TSLA", "AMD", "NFLX", "JPM"]
+THEMES = ["earnings beat", "guidance cut", "new product launch", "antitrust probe", "buyback",
+          "supply chain delays", "analyst upgrade", "CEO departure", "AI demand", "dividend increase"]
+
+
+def graph(count: int) -> tuple[list[dict], list[dict]]:
+    random.seed(1)
+    entities = [
+        {
+            "name": f"{random.choice(SYMBOLS)} note {index}",
+            "entityType": "company_news",
+            "observations": [f"{random.choice(THEMES)} reported in quarter {random.randint(1, 4)}" for _ in range(3)],
+        }
+        for index in range(count)
+    ]
+    relations = [
+        {"source": entities[index]["name"], "target": entities[index - 1]["name"], "type": "follows"}
+        for index in range(1, count)
+    ]
+    return entities, relations
+
+
+async def measure(name: str, params: dict, entities: list[dict], relations: list[dict], queries: list[str]) -> dict:
+    async with MCPServerStdio(params, client_session_timeout_seconds=120) as server:
+        for start in range(0, len(entities), BATCH):
+            await server.call_tool("create_entities", {"entities": entities[start:start + BATCH]})
+        for start in range(0, len(relations), BATCH):
+            await server.call_tool("create_relations", {"relations": relations[start:start + BATCH]})
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            await server.call_tool("search_nodes", {"query": query})
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "server": name,
+        "p50 ms": float(np.percentile(latencies, 50)),
+        "p95 ms": float(np.percentile(latencies, 95)),
+        "mean ms": float(np.mean(latencies)),
+    }
+
+
+async def main():
+    workdir = tempfile.mkdtemp(prefix="bench_memory_")
+    here = os.path.dirname(os.path.abspath(__file__))
+    entities, relations = graph(ENTITIES)
+    queries = [f"{random.choice(SYMBOLS)} {random.choice(THEMES)}" for _ in range(QUERIES)]
+    servers = [(
+        "native",
+        {
+            "command": sys.executable,
+            "args": [os.path.join(here, "memory_server.py")],
+            "cwd": workdir,
+            "env": {**os.environ, "MEMORY_PARTITION": "benchmark"},
+        },
+    )]
+    if shutil.which("npx"):
+        servers.append((
+            "libsql",
+            {"command": "npx", "args": ["-y", "mcp-memory-libsql"], "env": {**os.environ, "LIBSQL_URL": f"file:{workdir}/libsql.db"}},
+        ))
+    else:
+        print("npx not found; skipping the libsql server")
+    print(f"{ENTITIES} entities, {QUERIES} queries")
+    for name, params in servers:
+        try:
+            result = await measure(name, params, entities, relations, queries)
+            print(f"{result['server']:>8}: p50 {result['p50 ms']:.2f} ms, p95 {result['p95 ms']:.2f} ms, mean {result['mean ms']:.2f} ms")
+        except Exception as e:
+            print(f"{name:>8}: failed ({e})")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+import os
+import time
+from typing import Any
+from agents import Agent, ItemHelpers, Model, ModelResponse, RunContextWrapper, RunHooks, Tool
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from database import delete_checkpoint, delete_checkpoints, read_checkpoint, write_checkpoint
+from tracers import make_trace_id
+
+load_dotenv(override=True)
+
+CHECKPOINT_MAX_AGE_MINUTES = float(os.getenv("CHECKPOINT_MAX_AGE_MINUTES", "120"))
+LOST_OUTPUT = (
+    "The run was interrupted before this tool call's result was saved, so it may or may not have "
+    "taken effect. Check the account before repeating it."
+)
+
+
+def _plain(item):
+    return item.model_dump(exclude_unset=True) if isinstance(item, BaseModel) else item
+
+
+class Checkpoint:
+    """
+    The conversation of one trader run, saved under the run's trace ID after every model
+    response and every tool result.
+
+    A run that fails part way (a timeout, an MCP crash, a 429) leaves its checkpoint behind, and
+    the next run of the same kind within CHECKPOINT_MAX_AGE_MINUTES resumes from it, under the
+    same trace ID, instead of repeating the turns and research calls already paid for. A trade
+    that completed before the failure is in the checkpoint with its result, so it isn't replayed.
+    """
+
+    def __init__(self, trace_id: str, name: str, kind: str, turns: int = 0, items: list | None = None):
+        self.trace_id = trace_id
+        self.name = name
+        self.kind = kind
+        self.turns = turns
+        self.items = items
+
+    @classmethod
+    def resume_or_start(cls, name: str, kind: str) -> "Checkpoint":
+        since = time.time() - CHECKPOINT_MAX_AGE_MINUTES * 60
+        delete_checkpoints(name, before=since)
+        saved = read_checkpoint(name, kind, since)
+        if saved:
+            trace_id, turns, items = saved
+            return cls(trace_id, name, kind, turns, items)
+        return cls(make_trace_id(name.lower()), name, kind)
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.items)
+
+    def resume_input(self) -> list:
+        """The saved items, with an output for every tool call whose result was lost."""
+        answered = {item.get("call_id") for item in self.items if item.get("type") == "function_call_output"}
+        lost = [
+            {"type": "function_call_output", "call_id": item["call_id"], "output": LOST_OUTPUT}
+            for item in self.items
+            if item.get("type") == "function_call" and item.get("call_id") not in answered
+        ]
+        return self.items + lost
+
+    def save(self, turns: int, items: list) -> None:
+        self.turns, self.items = turns, [_plain(item) for item in items]
+        try:
+            write_checkpoint(self.trace_id, self.name, self.kind, turns, self.items, time.time())
+        except (TypeError, ValueError) as e:
+            print(f"Not checkpointing {self.trace_id}: {e}")
+
+    def add_output(self, call_id: str, output: str) -> None:
+        self.save(self.turns, self.items + [{"type": "function_call_output", "call_id": call_id, "output": output}])
+
+    def finish(self) -> None:
+        delete_checkpoint(self.trace_id)
+
+
+class CheckpointedModel(Model):
+    """
+    A Model that saves the agent's conversation after each response: its input, which holds
+    every earlier turn and tool result, followed by the tool calls it just made. CheckpointHooks
+    then adds each tool result as it arrives.
+    """
+
+    def __init__(self, model: Model, checkpoint: Checkpoint):
+        self.model = model
+        self.checkpoint = checkpoint
+        self._turns = checkpoint.turns
+
+    def _save(self, input, output: list) -> None:
+        self._turns += 1
+        self.checkpoint.save(self._turns, ItemHelpers.input_to_new_input_list(input) + output)
+
+    async def get_response(self, system_instructions, input, *args, **kwargs) -> ModelResponse:
+        response = await self.model.get_response(system_instructions, input, *args, **kwargs)
+        self._save(input, response.to_input_items())
+        return response
+
+    async def stream_response(self, system_instructions, input, *args, **kwargs):
+        async for event in self.model.stream_response(system_instructions, input, *args, **kwargs):
+            if event.type == "response.completed":
+                self._save(input, list(event.response.output))
+            yield event
+
+
+class CheckpointHooks(RunHooks):
+    """Adds each tool result to the run's checkpoint as soon as the tool returns."""
+
+    def __init__(self, checkpoint: Checkpoint):
+        self.checkpoint = checkpoint
+
+    async def on_tool_end(self, context: RunContextWrapper, agent: Agent, tool: Tool, result: Any) -> None:
+        call_id = getattr(context, "tool_call_id", None)
+        if call_id and self.checkpoint.items is not None:
+            self.checkpoint.add_output(call_id, str(result))
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+
+class SimulatedClock:
+    """A clock that only moves when told to, for replaying the trading floor faster than real time."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def now(self) -> datetime:
+        return self.current
+
+    def advance(self, delta: timedelta) -> datetime:
+        self.current += delta
+        return self.current
+
+
+_clock: SimulatedClock | None = None
+
+
+def now() -> datetime:
+    """The current local time, or the simulated time while a backtest has installed a clock."""
+    return _clock.now() if _clock else datetime.now()
+
+
+def use_clock(clock: SimulatedClock | None) -> None:
+    global _clock
+    _clock = clock
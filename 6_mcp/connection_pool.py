@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+DB = "accounts.db"
+
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "16384"))
+
+_local = threading.local()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """
+    Open a connection tuned for many small, concurrent reads and writes.
+
+    WAL lets readers (the UI) carry on while a trader writes, synchronous=NORMAL
+    drops the fsync on each commit (WAL stays consistent; only the last commits
+    can be lost on power failure), and busy_timeout makes writers wait for the lock
+    instead of failing with "database is locked".
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def _connections() -> dict:
+    """The connections owned by this thread, reset if we are in a forked child."""
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+        _local.depth = {}
+        _local.callbacks = {}
+    return _local.connections
+
+
+def use_database(path: str) -> None:
+    """Point every later get_connection() and transaction() without a path at this database file."""
+    global DB
+    DB = path
+
+
+def get_connection(path: str | None = None) -> sqlite3.Connection:
+    """
+    Return this thread's connection to the given database (default DB), opening it on first use.
+
+    Connections are in autocommit mode; use transaction() to group statements.
+    """
+    path = path or DB
+    connections = _connections()
+    conn = connections.get(path)
+    if conn is None:
+        conn = _connect(path)
+        connections[path] = conn
+    return conn
+
+
+@contextmanager
+def transaction(path: str | None = None):
+    """
+    Run the enclosed statements in one transaction on this thread's connection.
+
+    Nested uses join the outermost transaction, so helpers can be composed into a
+    single atomic commit. BEGIN IMMEDIATE takes the write lock up front, which avoids
+    deadlocking two writers that both started as readers.
+    """
+    path = path or DB
+    conn = get_connection(path)
+    depth = _local.depth.get(path, 0)
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE")
+        _local.callbacks[path] = []
+    _local.depth[path] = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth[path] = depth
+        if depth == 0:
+            conn.execute("ROLLBACK")
+            for _, rolled_back in reversed(_local.callbacks.pop(path)):
+                if rolled_back:
+                    rolled_back()
+        raise
+    _local.depth[path] = depth
+    if depth == 0:
+        conn.execute("COMMIT")
+        for committed, _ in _local.callbacks.pop(path):
+            committed()
+
+
+def after_commit(
+    committed: Callable[[], None],
+    rolled_back: Callable[[], None] | None = None,
+    path: str | None = None,
+) -> None:
+    """
+    Call committed once this thread's transaction on the database commits, or right away if
+    there is none; call rolled_back instead if it rolls back. Rollback callbacks run newest first.
+    """
+    path = path or DB
+    _connections()
+    if _local.depth.get(path, 0):
+        _local.callbacks[path].append((committed, rolled_back))
+    else:
+        committed()
+
+
+def close_connections() -> None:
+    """Close every connection owned by the calling thread."""
+    connections = _connections()
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+    _local.depth.clear()
+    _local.callbacks.clear()
@@ -1,46 +1,820 @@
-import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import clock
+import connection_pool
+from connection_pool import get_connection, transaction
 
 load_dotenv(override=True)
 
-DB = "accounts.db"
+# Portfolio values are kept raw for a recent window, then as open/high/low/close rollups.
+# Each tier maps to (bucket size, how long it is kept); None means forever.
+PORTFOLIO_TIERS = {
+    "raw": (None, timedelta(days=2)),
+    "5min": (timedelta(minutes=5), timedelta(days=14)),
+    "hour": (timedelta(hours=1), timedelta(days=180)),
+    "day": (timedelta(days=1), None),
+}
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
-with sqlite3.connect(DB) as conn:
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            datetime DATETIME,
-            type TEXT,
-            message TEXT
-        )
-    ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
+def _columns(conn, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
 
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
+
+def create_tables():
+    """Create any missing tables and indexes, and migrate data from older layouts."""
+    with transaction() as conn:
         cursor = conn.cursor()
+        if "account" in _columns(conn, "accounts"):
+            cursor.execute("ALTER TABLE accounts RENAME TO accounts_json")
         cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
+            CREATE TABLE IF NOT EXISTS accounts (
+                name TEXT PRIMARY KEY,
+                balance REAL NOT NULL,
+                strategy TEXT NOT NULL DEFAULT '',
+                transaction_count INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS holdings (
+                name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                PRIMARY KEY (name, symbol)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS traders (
+                name TEXT PRIMARY KEY,
+                lastname TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                short_model_name TEXT NOT NULL,
+                run_every_n_minutes REAL,
+                enabled INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ledger (
+                name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                realized REAL NOT NULL,
+                PRIMARY KEY (name, symbol)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                price REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                rationale TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_name_id ON transactions (name, id)')
+        if "transaction_count" not in _columns(conn, "accounts"):
+            cursor.execute("ALTER TABLE accounts ADD COLUMN transaction_count INTEGER NOT NULL DEFAULT 0")
+            cursor.execute('''
+                UPDATE accounts SET transaction_count = (SELECT COUNT(*) FROM transactions t WHERE t.name = accounts.name)
+            ''')
+        if "version" not in _columns(conn, "accounts"):
+            cursor.execute("ALTER TABLE accounts ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                side TEXT NOT NULL,
+                order_type TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                price REAL NOT NULL,
+                good_till_cancelled INTEGER NOT NULL,
+                expires_at TEXT,
+                rationale TEXT,
+                created TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'open',
+                fill_price REAL,
+                updated TEXT,
+                note TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_name ON orders (status, name)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS portfolio_values (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                datetime TEXT NOT NULL,
+                value REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_values_name_datetime ON portfolio_values (name, datetime)')
+        backfill_rollups = not _columns(conn, "portfolio_rollups")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS portfolio_rollups (
+                name TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                PRIMARY KEY (name, tier, bucket)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                datetime DATETIME,
+                type TEXT,
+                message TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_name_id ON logs (name, id)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS spans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                trace_id TEXT NOT NULL,
+                span_id TEXT NOT NULL,
+                parent_id TEXT,
+                type TEXT NOT NULL,
+                label TEXT,
+                server TEXT,
+                started TEXT NOT NULL,
+                ended TEXT NOT NULL,
+                duration REAL NOT NULL,
+                input_tokens INTEGER,
+                output_tokens INTEGER,
+                error TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_spans_started ON spans (started)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                trace_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                turns INTEGER NOT NULL,
+                items TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_checkpoints_name_kind ON checkpoints (name, kind, updated)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS research (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS memory_entities (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                partition TEXT NOT NULL,
+                name TEXT NOT NULL,
+                entity_type TEXT NOT NULL,
+                observations TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                UNIQUE (partition, name)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS memory_relations (
+                partition TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                relation_type TEXT NOT NULL,
+                PRIMARY KEY (partition, source, target, relation_type)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_relations_target ON memory_relations (partition, target)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS floor_heartbeats (
+                shard INTEGER PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                beat REAL NOT NULL
+            )
+        ''')
+        # The market table was keyed by the day prices were fetched for, holding the close before it;
+        # market_closes is keyed by the date of the close itself, so the old rows can't be reused
+        cursor.execute('DROP TABLE IF EXISTS market')
+        cursor.execute('CREATE TABLE IF NOT EXISTS market_closes (date TEXT PRIMARY KEY, data TEXT)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prices (
+                plan TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                price REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (plan, symbol)
+            ) WITHOUT ROWID
+        ''')
+    migrate_json_accounts()
+    if backfill_rollups:
+        _backfill_portfolio_rollups()
 
-def read_account(name):
-    with sqlite3.connect(DB) as conn:
+
+def use_database(path: str):
+    """Switch this process to another database file (e.g. for a backtest), creating its tables."""
+    connection_pool.use_database(path)
+    create_tables()
+
+
+def _bucket(timestamp: str, size: timedelta) -> str:
+    """The start of the bucket of the given size that the timestamp falls in."""
+    moment = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    seconds = int(size.total_seconds())
+    epoch = datetime(1970, 1, 1)
+    start = epoch + timedelta(seconds=int((moment - epoch).total_seconds()) // seconds * seconds)
+    return start.strftime(TIMESTAMP_FORMAT)
+
+def _append_portfolio_values(cursor, name: str, values: list[tuple[str, float]]):
+    """Insert raw portfolio values, fold them into every rollup tier and apply retention."""
+    cursor.executemany(
+        'INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)',
+        [(name, timestamp, value) for timestamp, value in values],
+    )
+    _roll_up_portfolio_values(cursor, name, values)
+    _apply_portfolio_retention(cursor, name)
+
+def _roll_up_portfolio_values(cursor, name: str, values: list[tuple[str, float]]):
+    """Fold (datetime, value) points, oldest first, into the open/high/low/close buckets."""
+    rollups = [
+        (name, tier, _bucket(timestamp, size), value, value, value, value)
+        for tier, (size, _) in PORTFOLIO_TIERS.items() if size
+        for timestamp, value in values
+    ]
+    cursor.executemany('''
+        INSERT INTO portfolio_rollups (name, tier, bucket, open, high, low, close)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(name, tier, bucket) DO UPDATE SET
+            high=max(high, excluded.high), low=min(low, excluded.low), close=excluded.close
+    ''', rollups)
+
+def _apply_portfolio_retention(cursor, name: str):
+    now = clock.now()
+    for tier, (_, retention) in PORTFOLIO_TIERS.items():
+        if retention is None:
+            continue
+        cutoff = (now - retention).strftime(TIMESTAMP_FORMAT)
+        if tier == "raw":
+            cursor.execute('DELETE FROM portfolio_values WHERE name = ? AND datetime < ?', (name, cutoff))
+        else:
+            cursor.execute(
+                'DELETE FROM portfolio_rollups WHERE name = ? AND tier = ? AND bucket < ?', (name, tier, cutoff)
+            )
+
+def write_account(
+    name: str,
+    balance: float,
+    strategy: str,
+    holdings: dict[str, int],
+    new_transactions: list[dict] = (),
+    new_values: list[tuple[str, float]] = (),
+    replace_history: bool = False,
+    ledger: dict[str, tuple[int, float, float]] | None = None,
+):
+    """
+    Save an account in one transaction. Only the new transactions and portfolio values
+    are inserted, so the cost of a save doesn't grow with the account's history.
+    Every save advances the account's version, so other processes can tell it changed.
+
+    Args:
+        name (str): The account name
+        balance (float): The cash balance
+        strategy (str): The investment strategy
+        holdings (dict): Quantity held of each symbol
+        new_transactions (list): Transactions not yet persisted, as dicts
+        new_values (list): (datetime, value) points not yet persisted
+        replace_history (bool): Delete the stored transactions and values first
+        ledger (dict): (quantity, cost, realized) of each symbol traded, to replace the stored ledger
+
+    Returns:
+        int: The account's new version
+    """
+    name = name.lower()
+    with transaction() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
+        cursor.execute('''
+            INSERT INTO accounts (name, balance, strategy)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET balance=excluded.balance, strategy=excluded.strategy, version=version + 1
+        ''', (name, balance, strategy))
+        cursor.execute('DELETE FROM holdings WHERE name = ?', (name,))
+        cursor.executemany(
+            'INSERT INTO holdings (name, symbol, quantity) VALUES (?, ?, ?)',
+            [(name, symbol, quantity) for symbol, quantity in holdings.items()],
+        )
+        if ledger is not None:
+            cursor.execute('DELETE FROM ledger WHERE name = ?', (name,))
+            cursor.executemany(
+                'INSERT INTO ledger (name, symbol, quantity, cost, realized) VALUES (?, ?, ?, ?, ?)',
+                [(name, symbol, *position) for symbol, position in ledger.items()],
+            )
+        if replace_history:
+            cursor.execute('DELETE FROM transactions WHERE name = ?', (name,))
+            cursor.execute('DELETE FROM portfolio_values WHERE name = ?', (name,))
+            cursor.execute('DELETE FROM portfolio_rollups WHERE name = ?', (name,))
+            cursor.execute('UPDATE accounts SET transaction_count = 0 WHERE name = ?', (name,))
+        if new_transactions:
+            cursor.executemany('''
+                INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"])
+                for t in new_transactions
+            ])
+            cursor.execute(
+                'UPDATE accounts SET transaction_count = transaction_count + ? WHERE name = ?',
+                (len(new_transactions), name),
+            )
+        if new_values:
+            _append_portfolio_values(cursor, name, new_values)
+        return cursor.execute('SELECT version FROM accounts WHERE name = ?', (name,)).fetchone()[0]
+
+def reset_accounts(
+    accounts: list[tuple[str, float, str]],
+    cancelled_at: str,
+    clear_logs: bool = False,
+    clear_memory: bool = False,
+):
+    """
+    Create or reset many accounts in one transaction: each gets its balance and strategy and
+    loses its holdings, ledger, transactions, portfolio history, open orders and run
+    checkpoints. Each table is cleared with one statement for all the accounts.
+
+    Args:
+        accounts (list): (name, balance, strategy) of each account
+        cancelled_at (str): the time to record on the open orders that are cancelled
+        clear_logs (bool): also delete the accounts' logs and trace spans
+        clear_memory (bool): also delete each trader's own memory partition
+    """
+    names = [(name.lower(),) for name, _, _ in accounts]
+    tables = ["holdings", "ledger", "transactions", "portfolio_values", "portfolio_rollups", "checkpoints"]
+    if clear_logs:
+        tables += ["logs", "spans"]
+    with transaction() as conn:
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS reset_names (name TEXT PRIMARY KEY)')
+        conn.execute('DELETE FROM temp.reset_names')
+        conn.executemany('INSERT OR IGNORE INTO temp.reset_names (name) VALUES (?)', names)
+        conn.executemany('''
+            INSERT INTO accounts (name, balance, strategy)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET balance=excluded.balance, strategy=excluded.strategy, transaction_count=0,
+                version=version + 1
+        ''', [(name.lower(), balance, strategy) for name, balance, strategy in accounts])
+        for table in tables:
+            conn.execute(f'DELETE FROM {table} WHERE name IN (SELECT name FROM temp.reset_names)')
+        conn.execute('''
+            UPDATE orders SET status = 'cancelled', updated = ?, note = 'account reset'
+            WHERE status = 'open' AND name IN (SELECT name FROM temp.reset_names)
+        ''', (cancelled_at,))
+        if clear_memory:
+            for table in ("memory_entities", "memory_relations"):
+                conn.execute(f'DELETE FROM {table} WHERE partition IN (SELECT name FROM temp.reset_names)')
+
+def read_account(name):
+    """
+    Read an account from the normalized tables: its balance, strategy, holdings and how many
+    transactions it has. The transactions themselves are read a page at a time with read_transactions.
+
+    Returns:
+        dict | None: The account fields, or None if there is no such account
+    """
+    name = name.lower()
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT balance, strategy, transaction_count, version FROM accounts WHERE name = ?', (name,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    balance, strategy, transaction_count, version = row
+    cursor.execute('SELECT symbol, quantity FROM holdings WHERE name = ?', (name,))
+    holdings = dict(cursor.fetchall())
+    return {
+        "name": name,
+        "balance": balance,
+        "strategy": strategy,
+        "holdings": holdings,
+        "transaction_count": transaction_count,
+        "version": version,
+    }
+
+def read_account_versions(names: list[str]) -> dict[str, int]:
+    """The current version of each of these accounts that exists."""
+    cursor = get_connection().cursor()
+    cursor.execute(
+        f'SELECT name, version FROM accounts WHERE name IN ({",".join("?" * len(names))})',
+        [name.lower() for name in names],
+    )
+    return dict(cursor.fetchall())
+
+def read_transactions(name: str, limit: int = -1, skip: int = 0) -> list[dict]:
+    """
+    Read an account's transactions, newest first.
+
+    Args:
+        name (str): The account name
+        limit (int): Maximum number of transactions to read, or -1 for all of them
+        skip (int): Number of the most recent transactions to skip
+
+    Returns:
+        list: The transactions, as dicts
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+        WHERE name = ?
+        ORDER BY id DESC
+        LIMIT ? OFFSET ?
+    ''', (name.lower(), limit, skip))
+    return [
+        {"symbol": symbol, "quantity": quantity, "price": price, "timestamp": timestamp, "rationale": rationale}
+        for symbol, quantity, price, timestamp, rationale in cursor.fetchall()
+    ]
     
+ORDER_COLUMNS = (
+    "id", "name", "symbol", "side", "order_type", "quantity", "price", "good_till_cancelled",
+    "expires_at", "rationale", "created", "status", "fill_price", "updated", "note",
+)
+
+def write_order(order: dict) -> int:
+    """
+    Insert a new open order.
+
+    Returns:
+        int: The id of the order
+    """
+    columns = [column for column in ORDER_COLUMNS if column in order and column != "id"]
+    with transaction() as conn:
+        cursor = conn.execute(
+            f'INSERT INTO orders ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+            [order[column] for column in columns],
+        )
+    return cursor.lastrowid
+
+def read_orders(name: str | None = None, status: str | None = "open") -> list[dict]:
+    """
+    Read orders, oldest first, optionally only those of one account and/or with one status.
+    """
+    conditions, params = [], []
+    if status is not None:
+        conditions.append("status = ?")
+        params.append(status)
+    if name is not None:
+        conditions.append("name = ?")
+        params.append(name.lower())
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor = get_connection().cursor()
+    cursor.execute(f'SELECT {", ".join(ORDER_COLUMNS)} FROM orders {where} ORDER BY id', params)
+    return [dict(zip(ORDER_COLUMNS, row)) for row in cursor.fetchall()]
+
+def update_orders(updates: list[tuple[int, str, float | None, str, str | None]], status: str = "open") -> int:
+    """
+    Close orders in one statement batch. Only orders that still have the given status are
+    changed, so an order another process has already closed is left alone.
+
+    Args:
+        updates (list): (id, status, fill_price, updated, note) for each order
+        status (str): The status the orders must have to be changed
+
+    Returns:
+        int: How many orders were changed
+    """
+    with transaction() as conn:
+        cursor = conn.executemany(
+            "UPDATE orders SET status = ?, fill_price = ?, updated = ?, note = ? WHERE id = ? AND status = ?",
+            [(new_status, fill_price, updated, note, id, status) for id, new_status, fill_price, updated, note in updates],
+        )
+        return cursor.rowcount
+
+def read_ledger(name: str) -> dict[str, tuple[int, float, float]]:
+    """
+    Read an account's stored ledger.
+
+    Returns:
+        dict: symbol to (quantity, cost, realized)
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT symbol, quantity, cost, realized FROM ledger WHERE name = ?', (name.lower(),))
+    return {symbol: (quantity, cost, realized) for symbol, quantity, cost, realized in cursor.fetchall()}
+
+def write_traders(traders: list[dict]):
+    """
+    Add traders to the registry, or update them, in one transaction.
+
+    Args:
+        traders (list): dicts with name, lastname, model_name and short_model_name, and
+            optionally run_every_n_minutes (None for the floor's default) and enabled
+    """
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO traders (name, lastname, model_name, short_model_name, run_every_n_minutes, enabled)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                lastname=excluded.lastname,
+                model_name=excluded.model_name,
+                short_model_name=excluded.short_model_name,
+                run_every_n_minutes=excluded.run_every_n_minutes,
+                enabled=excluded.enabled
+        ''', [
+            (
+                trader["name"],
+                trader["lastname"],
+                trader["model_name"],
+                trader.get("short_model_name", trader["model_name"]),
+                trader.get("run_every_n_minutes"),
+                int(trader.get("enabled", True)),
+            )
+            for trader in traders
+        ])
+
+def read_traders(enabled_only: bool = True) -> list[dict]:
+    """Read the trader registry, in the order the traders were registered."""
+    columns = ["name", "lastname", "model_name", "short_model_name", "run_every_n_minutes", "enabled"]
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT {", ".join(columns)} FROM traders
+        {"WHERE enabled = 1" if enabled_only else ""}
+        ORDER BY rowid
+    ''')
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def read_account_names() -> list[str]:
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT name FROM accounts ORDER BY name')
+    return [name for (name,) in cursor.fetchall()]
+
+def write_checkpoint(trace_id: str, name: str, kind: str, turns: int, items: list, updated: float):
+    """Save a run's conversation after its latest completed turn, replacing the previous checkpoint."""
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO checkpoints (trace_id, name, kind, turns, items, updated)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(trace_id) DO UPDATE SET
+                turns=excluded.turns, items=excluded.items, updated=excluded.updated
+        ''', (trace_id, name.lower(), kind, turns, json.dumps(items), updated))
+
+def read_checkpoint(name: str, kind: str, since: float) -> tuple[str, int, list] | None:
+    """
+    Read the latest checkpoint of an unfinished run of this kind saved after since (a Unix time).
+
+    Returns:
+        tuple: (trace_id, turns, items), or None if there is none
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT trace_id, turns, items FROM checkpoints
+        WHERE name = ? AND kind = ? AND updated > ?
+        ORDER BY updated DESC LIMIT 1
+    ''', (name.lower(), kind, since))
+    row = cursor.fetchone()
+    return (row[0], row[1], json.loads(row[2])) if row else None
+
+def delete_checkpoint(trace_id: str):
+    with transaction() as conn:
+        conn.execute('DELETE FROM checkpoints WHERE trace_id = ?', (trace_id,))
+
+def delete_checkpoints(name: str, before: float):
+    """Delete a trader's checkpoints last saved at or before before (a Unix time)."""
+    with transaction() as conn:
+        conn.execute('DELETE FROM checkpoints WHERE name = ? AND updated <= ?', (name.lower(), before))
+
+def write_floor_heartbeat(shard: int, pid: int, now: float):
+    """Record that a shard of the trading floor is running in process pid, as of now (a Unix time)."""
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO floor_heartbeats (shard, pid, beat) VALUES (?, ?, ?)
+            ON CONFLICT(shard) DO UPDATE SET pid=excluded.pid, beat=excluded.beat
+        ''', (shard, pid, now))
+
+def read_floor_heartbeats(since: float) -> list[tuple[int, int, float]]:
+    """
+    Read the heartbeats of the trading floor shards that have beaten after since (a Unix time).
+
+    Returns:
+        list: (shard, pid, beat) tuples
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT shard, pid, beat FROM floor_heartbeats WHERE beat > ? ORDER BY shard', (since,))
+    return cursor.fetchall()
+
+def delete_floor_heartbeat(shard: int):
+    with transaction() as conn:
+        conn.execute('DELETE FROM floor_heartbeats WHERE shard = ?', (shard,))
+
+def portfolio_tier(window: timedelta | None) -> str:
+    """The finest tier whose retention covers the window; None means all history."""
+    for tier, (_, retention) in PORTFOLIO_TIERS.items():
+        if retention is None or (window is not None and window <= retention):
+            return tier
+
+def read_portfolio_values(name: str, window: timedelta | None = None) -> list[tuple[str, float]]:
+    """
+    Read the portfolio value history for a chart covering the given window, from the
+    finest tier that still holds it. Rollup tiers report each bucket's closing value.
+
+    Args:
+        name (str): The account name
+        window (timedelta | None): How far back to read, or None for all history
+
+    Returns:
+        list: A list of (datetime, value) tuples, oldest first
+    """
+    name = name.lower()
+    cursor = get_connection().cursor()
+    if window is None:
+        cursor.execute('SELECT min(bucket) FROM portfolio_rollups WHERE name = ? AND tier = ?', (name, "day"))
+        first = cursor.fetchone()[0]
+        if first:
+            window = clock.now() - datetime.strptime(first, TIMESTAMP_FORMAT)
+    tier = portfolio_tier(window)
+    since = (clock.now() - window).strftime(TIMESTAMP_FORMAT) if window else ""
+    if tier == "raw":
+        cursor.execute('''
+            SELECT datetime, value FROM portfolio_values
+            WHERE name = ? AND datetime >= ?
+            ORDER BY datetime
+        ''', (name, since))
+    else:
+        cursor.execute('''
+            SELECT bucket, close FROM portfolio_rollups
+            WHERE name = ? AND tier = ? AND bucket >= ?
+            ORDER BY bucket
+        ''', (name, tier, since))
+    return cursor.fetchall()
+
+def write_prices(plan: str, prices: dict[str, float], expires_at: float) -> None:
+    """
+    Cache share prices for other processes to reuse until expires_at (a Unix time).
+    """
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO prices (plan, symbol, price, expires_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(plan, symbol) DO UPDATE SET price=excluded.price, expires_at=excluded.expires_at
+        ''', [(plan, symbol, price, expires_at) for symbol, price in prices.items()])
+
+def read_prices(plan: str, symbols: list[str], now: float) -> dict[str, tuple[float, float]]:
+    """
+    Read the cached share prices that are still valid at now (a Unix time).
+
+    Returns:
+        dict: symbol to (price, expires_at) for the symbols found
+    """
+    placeholders = ",".join("?" * len(symbols))
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT symbol, price, expires_at FROM prices
+        WHERE plan = ? AND expires_at > ? AND symbol IN ({placeholders})
+    ''', (plan, now, *symbols))
+    return {symbol: (price, expires_at) for symbol, price, expires_at in cursor.fetchall()}
+
+def write_research(key: str, source: str, digest: str, seconds: float, expires_at: float) -> None:
+    """
+    Index a fetched page or search result by its request key, until expires_at (a Unix time).
+
+    Args:
+        digest (str): the content address of the stored text
+        seconds (float): how long the fetch took, which each later hit saves
+    """
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO research (key, source, digest, seconds, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                digest=excluded.digest, seconds=excluded.seconds, expires_at=excluded.expires_at
+        ''', (key, source, digest, seconds, expires_at))
+
+def read_research(key: str, now: float) -> tuple[str, float] | None:
+    """
+    Read the index entry for a request key, if it is still valid at now (a Unix time).
+
+    Returns:
+        tuple: (digest, seconds), or None
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT digest, seconds FROM research WHERE key = ? AND expires_at > ?', (key, now))
+    return cursor.fetchone()
+
+def prune_research(now: float) -> set[str]:
+    """Drop the expired index entries and return the digests still referenced."""
+    with transaction() as conn:
+        conn.execute('DELETE FROM research WHERE expires_at <= ?', (now,))
+        return {digest for (digest,) in conn.execute('SELECT DISTINCT digest FROM research').fetchall()}
+
+MEMORY_ENTITY_COLUMNS = ("id", "name", "entity_type", "observations", "embedding")
+
+def write_memory_entities(partition: str, entities: list[tuple[str, str, list[str], bytes]]):
+    """
+    Store entities in a memory partition, replacing any with the same names, in one transaction.
+    Replaced entities get new ids, so readers can pick up every change by id.
+
+    Args:
+        entities (list): (name, entity_type, observations, embedding) tuples
+    """
+    with transaction() as conn:
+        conn.executemany(
+            'DELETE FROM memory_entities WHERE partition = ? AND name = ?',
+            [(partition, name) for name, *_ in entities],
+        )
+        conn.executemany('''
+            INSERT INTO memory_entities (partition, name, entity_type, observations, embedding)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (partition, name, entity_type, json.dumps(observations), embedding)
+            for name, entity_type, observations, embedding in entities
+        ])
+
+def read_memory_entities(partition: str, after_id: int = 0, names: list[str] | None = None) -> list[dict]:
+    """Read a partition's entities with ids above after_id, or only those with these names."""
+    query = f'SELECT {", ".join(MEMORY_ENTITY_COLUMNS)} FROM memory_entities WHERE partition = ? AND id > ?'
+    params = [partition, after_id]
+    if names is not None:
+        query += f' AND name IN ({",".join("?" * len(names))})'
+        params += names
+    cursor = get_connection().cursor()
+    cursor.execute(query + ' ORDER BY id', params)
+    entities = [dict(zip(MEMORY_ENTITY_COLUMNS, row)) for row in cursor.fetchall()]
+    for entity in entities:
+        entity["observations"] = json.loads(entity["observations"])
+    return entities
+
+def read_data_version() -> int:
+    """A number that changes whenever another connection commits to the database."""
+    return get_connection().execute('PRAGMA data_version').fetchone()[0]
+
+def read_memory_version(partition: str) -> tuple[int, int]:
+    """The number of entities in a partition and the highest id, which change with every write."""
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM memory_entities WHERE partition = ?', (partition,))
+    return cursor.fetchone()
+
+def delete_memory_entity(partition: str, name: str):
+    """Delete an entity and every relation to or from it."""
+    with transaction() as conn:
+        conn.execute('DELETE FROM memory_entities WHERE partition = ? AND name = ?', (partition, name))
+        conn.execute(
+            'DELETE FROM memory_relations WHERE partition = ? AND (source = ? OR target = ?)',
+            (partition, name, name),
+        )
+
+def write_memory_relations(partition: str, relations: list[tuple[str, str, str]]):
+    """Add (source, target, relation_type) relations to a partition, ignoring ones it has."""
+    with transaction() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO memory_relations (partition, source, target, relation_type) VALUES (?, ?, ?, ?)',
+            [(partition, *relation) for relation in relations],
+        )
+
+def read_memory_relations(partition: str, names: list[str] | None = None) -> list[tuple[str, str, str]]:
+    """Read a partition's (source, target, relation_type) relations, or only those touching these names."""
+    query = 'SELECT source, target, relation_type FROM memory_relations WHERE partition = ?'
+    params = [partition]
+    if names is not None:
+        # A union, rather than OR, lets each half use an index
+        placeholders = ",".join("?" * len(names))
+        query = f'{query} AND source IN ({placeholders}) UNION {query} AND target IN ({placeholders})'
+        params = [partition, *names, partition, *names]
+    cursor = get_connection().cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def delete_memory_relation(partition: str, source: str, target: str, relation_type: str):
+    with transaction() as conn:
+        conn.execute(
+            'DELETE FROM memory_relations WHERE partition = ? AND source = ? AND target = ? AND relation_type = ?',
+            (partition, source, target, relation_type),
+        )
+
+def migrate_json_accounts():
+    """
+    Move accounts stored as one JSON blob per row into the normalized tables.
+    The old rows are kept in accounts_json as a backup; nothing happens once
+    the new accounts table has any rows.
+    """
+    with transaction() as conn:
+        if not _columns(conn, "accounts_json"):
+            return
+        if conn.execute('SELECT 1 FROM accounts LIMIT 1').fetchone():
+            return
+        for name, account_json in conn.execute('SELECT name, account FROM accounts_json').fetchall():
+            account = json.loads(account_json)
+            write_account(
+                name,
+                account["balance"],
+                account.get("strategy", ""),
+                account.get("holdings", {}),
+                account.get("transactions", []),
+                account.get("portfolio_value_time_series", []),
+            )
+
 def write_log(name: str, type: str, message: str):
     """
     Write a log entry to the logs table.
@@ -52,13 +826,56 @@ def write_log(name: str, type: str, message: str):
     """
     now = datetime.now().isoformat()
     
-    with sqlite3.connect(DB) as conn:
+    with transaction() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO logs (name, datetime, type, message)
             VALUES (?, datetime('now'), ?, ?)
         ''', (name.lower(), type, message))
-        conn.commit()
+
+def write_logs(records: list[tuple[str, str, str, str]]):
+    """
+    Write a batch of log entries to the logs table in one transaction.
+
+    Args:
+        records (list): Tuples of (name, datetime, type, message)
+    """
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO logs (name, datetime, type, message)
+            VALUES (?, ?, ?, ?)
+        ''', [(name.lower(), when, type, message) for name, when, type, message in records])
+
+SPAN_COLUMNS = (
+    "name", "trace_id", "span_id", "parent_id", "type", "label", "server",
+    "started", "ended", "duration", "input_tokens", "output_tokens", "error",
+)
+
+def write_spans(records: list[tuple]):
+    """
+    Write a batch of finished spans to the spans table in one transaction.
+
+    Args:
+        records (list): Tuples of the values in SPAN_COLUMNS, in that order
+    """
+    with transaction() as conn:
+        conn.executemany(
+            f'INSERT INTO spans ({", ".join(SPAN_COLUMNS)}) VALUES ({", ".join("?" * len(SPAN_COLUMNS))})',
+            records,
+        )
+
+def read_spans(since: str | None = None, name: str | None = None, types: list[str] | None = None) -> list[dict]:
+    """Read the spans that started at or after since (e.g. '2025-01-01 09:30:00', in UTC), oldest first."""
+    query, params = f'SELECT {", ".join(SPAN_COLUMNS)} FROM spans WHERE started >= ?', [since or ""]
+    if name:
+        query += ' AND name = ?'
+        params.append(name.lower())
+    if types:
+        query += f' AND type IN ({",".join("?" * len(types))})'
+        params += types
+    cursor = get_connection().cursor()
+    cursor.execute(query + ' ORDER BY started', params)
+    return [dict(zip(SPAN_COLUMNS, row)) for row in cursor.fetchall()]
 
 def read_log(name: str, last_n=10):
     """
@@ -71,31 +888,67 @@ def read_log(name: str, last_n=10):
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT datetime, type, message FROM logs 
+        WHERE name = ? 
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (name.lower(), last_n))
+    
+    return reversed(cursor.fetchall())
+
+def read_log_since(name: str, last_id: int = 0, limit: int = 100):
+    """
+    Read the log entries for a given name written after last_id, for tailing the log.
+    If more than limit entries are new, only the most recent limit are returned.
+    
+    Args:
+        name (str): The name to retrieve logs for
+        last_id (int): The id of the last entry already seen, or 0 for none
+        limit (int): Maximum number of entries to retrieve
         
-        return reversed(cursor.fetchall())
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message), oldest first
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT id, datetime, type, message FROM logs
+        WHERE name = ? AND id > ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (name.lower(), last_id, limit))
+    
+    return cursor.fetchall()[::-1]
 
 def write_market(date: str, data: dict) -> None:
+    """Store the market at the close on this date."""
     data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
+    with transaction() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO market (date, data)
+            INSERT INTO market_closes (date, data)
             VALUES (?, ?)
             ON CONFLICT(date) DO UPDATE SET data=excluded.data
         ''', (date, data_json))
-        conn.commit()
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
+    """Read the market at the close on this date, if it has been stored."""
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT data FROM market_closes WHERE date = ?', (date,))
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _backfill_portfolio_rollups():
+    """Build the rollup tiers from raw portfolio values stored before rollups existed."""
+    with transaction() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+        names = [row[0] for row in cursor.execute('SELECT DISTINCT name FROM portfolio_values')]
+        for name in names:
+            cursor.execute('SELECT datetime, value FROM portfolio_values WHERE name = ? ORDER BY datetime', (name,))
+            _roll_up_portfolio_values(cursor, name, cursor.fetchall())
+            _apply_portfolio_retention(cursor, name)
+
+
+create_tables()
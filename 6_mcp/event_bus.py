@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+import time
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from connection_pool import get_connection
+
+load_dotenv(override=True)
+
+WATCH_INTERVAL_SECONDS = float(os.getenv("DATABASE_WATCH_SECONDS", "0.25"))
+
+LOGS = "logs"
+ACCOUNT = "account"
+
+
+class EventBus:
+    """
+    In-process publish/subscribe of change notifications, keyed by account name.
+
+    publish() can be called from any thread; each subscriber receives the topics published
+    for its name on its own event loop.
+    """
+
+    def __init__(self):
+        self._subscribers: list[tuple[str, asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, name: str) -> None:
+        with self._lock:
+            subscribers = [(loop, queue) for subscribed, loop, queue in self._subscribers if subscribed == name]
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, topic)
+
+    async def subscribe(self, name: str) -> AsyncIterator[str]:
+        """Yield each topic published for this name until the caller stops iterating."""
+        subscriber = (name.lower(), asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.append(subscriber)
+        try:
+            while True:
+                yield await subscriber[2].get()
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+
+class DatabaseWatcher(threading.Thread):
+    """
+    Publishes what changed in the database, whichever process wrote it.
+
+    PRAGMA data_version only changes when another connection commits, so checking it is
+    nearly free while nothing happens. After a commit, two indexed queries find which
+    accounts have new log entries and which have new balances, transactions or values.
+    """
+
+    def __init__(self, bus: EventBus, interval: float = WATCH_INTERVAL_SECONDS):
+        super().__init__(name="database-watcher", daemon=True)
+        self.bus = bus
+        self.interval = interval
+        self._last_log_id = None
+        self._accounts: dict[str, tuple] = {}
+
+    def run(self) -> None:
+        conn = get_connection()
+        data_version = None
+        while True:
+            try:
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if version != data_version:
+                    data_version = version
+                    self.scan(conn)
+            except Exception as e:
+                print(f"Error watching the database: {e}")
+            time.sleep(self.interval)
+
+    def scan(self, conn) -> None:
+        baseline = self._last_log_id is None
+        last_log_id = self._last_log_id or 0
+        for name, log_id in conn.execute(
+            "SELECT name, MAX(id) FROM logs WHERE id > ? GROUP BY name", (last_log_id,)
+        ).fetchall():
+            self._last_log_id = max(self._last_log_id or 0, log_id)
+            if not baseline:
+                self.bus.publish(LOGS, name)
+        self._last_log_id = self._last_log_id or 0
+
+        rows = conn.execute('''
+            SELECT name, balance, strategy,
+                (SELECT MAX(id) FROM transactions t WHERE t.name = a.name),
+                (SELECT MAX(id) FROM portfolio_values p WHERE p.name = a.name)
+            FROM accounts a
+        ''').fetchall()
+        for name, *signature in rows:
+            signature = tuple(signature)
+            if self._accounts.get(name) != signature:
+                if not baseline:
+                    self.bus.publish(ACCOUNT, name)
+                self._accounts[name] = signature
+
+
+bus = EventBus()
@@ -0,0 +1,89 @@
+from pydantic import BaseModel
+
+TOLERANCE = 1e-6
+
+
+class Position(BaseModel):
+    """A symbol's running totals: shares held, their average-cost basis, and the profit taken so far."""
+    quantity: int = 0
+    cost: float = 0.0
+    realized: float = 0.0
+
+    @property
+    def average_cost(self) -> float:
+        return self.cost / self.quantity if self.quantity else 0.0
+
+
+class Ledger(BaseModel):
+    """
+    Cost basis and P&L for an account, updated in O(1) per transaction instead of being
+    recomputed from the whole history. Sales are costed at the average cost of the shares
+    held, and the difference from the sale proceeds is realized profit or loss.
+    """
+    positions: dict[str, Position] = {}
+
+    def record(self, symbol: str, quantity: int, price: float) -> None:
+        """Apply one transaction: a positive quantity is a purchase, a negative one a sale."""
+        position = self.positions.setdefault(symbol, Position())
+        if quantity > 0:
+            position.cost += quantity * price
+        elif position.quantity:
+            sold_cost = position.average_cost * -quantity
+            position.cost -= sold_cost
+            position.realized += -quantity * price - sold_cost
+        position.quantity += quantity
+        if position.quantity == 0:
+            position.cost = 0.0
+
+    @classmethod
+    def rebuild(cls, transactions) -> "Ledger":
+        """Replay a transaction log, oldest first, into a new ledger."""
+        ledger = cls()
+        for transaction in transactions:
+            ledger.record(transaction.symbol, transaction.quantity, transaction.price)
+        return ledger
+
+    def average_costs(self) -> dict[str, float]:
+        return {symbol: position.average_cost for symbol, position in self.positions.items() if position.quantity}
+
+    def realized(self) -> float:
+        return sum(position.realized for position in self.positions.values())
+
+    def unrealized(self, prices: dict[str, float]) -> float:
+        return sum(
+            position.quantity * prices.get(symbol, 0.0) - position.cost
+            for symbol, position in self.positions.items()
+            if position.quantity
+        )
+
+    def cost(self) -> float:
+        return sum(position.cost for position in self.positions.values())
+
+    def differences(self, other: "Ledger", tolerance: float = TOLERANCE) -> list[str]:
+        """Describe every position where this ledger and the other disagree."""
+        differences = []
+        for symbol in sorted(set(self.positions) | set(other.positions)):
+            mine = self.positions.get(symbol, Position())
+            theirs = other.positions.get(symbol, Position())
+            for field in ("quantity", "cost", "realized"):
+                a, b = getattr(mine, field), getattr(theirs, field)
+                if abs(a - b) > tolerance * max(1.0, abs(b)):
+                    differences.append(f"{symbol} {field}: {a} != {b}")
+        return differences
+
+
+if __name__ == "__main__":
+    import argparse
+    from accounts import Account
+    from database import read_account_names
+
+    parser = argparse.ArgumentParser(description="Check every account's ledger against its transaction log")
+    parser.add_argument("--repair", action="store_true", help="Rebuild any ledger that disagrees")
+    args = parser.parse_args()
+
+    for name in read_account_names():
+        differences = Account.get(name).check_ledger(repair=args.repair)
+        status = ("repaired" if args.repair else "inconsistent") if differences else "ok"
+        print(f"{name}: {status}")
+        for difference in differences:
+            print(f"    {difference}")
@@ -0,0 +1,130 @@
+"""
+Measure how the trading floor's scheduling scales with the number of traders.
+
+    uv run load_test.py [--traders 4 16 64 256] [--seconds 30] [--every 5] [--latency 0.5]
+
+Each trader is registered in the trader registry of a separate load test database and runs
+through the real Scheduler, Agent and Runner code. The LLM is replaced by a stub that waits
+--latency seconds per call and then makes one random trade, and every trader shares one
+in-process accounts server and one market server. Each trader is due every --every seconds.
+For each trader count, the test reports completed cycles per hour, the p50 and p95
+latency of a cycle, and the p95 lag between a cycle falling due and starting, which grows
+once the concurrency limit is saturated.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import numpy as np
+import pandas as pd
+from agents import set_tracing_disabled
+import market
+from accounts_server import accounts, mcp as accounts_mcp
+from backtest import BacktestTrader, InProcessMCPServer, ScriptedModel
+from database import read_traders, use_database, write_traders
+from market_server import mcp as market_mcp
+from rate_limit import TokenBucket
+from scheduler import Job, Scheduler
+from trading_floor import MAX_CONCURRENT_TRADERS, MAX_TRADER_RUNS_PER_MINUTE, minutes_between_runs
+
+LOAD_TEST_DB = "loadtest.db"
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG", "META", "TSLA", "SPY"]
+
+
+class History:
+    """The scripted model's view of past prices; the load test's policy doesn't need any."""
+
+    @staticmethod
+    def history() -> pd.DataFrame:
+        return pd.DataFrame()
+
+
+def random_trade(holdings, balance, history) -> list[tuple[str, dict]]:
+    symbol = random.choice(SYMBOLS)
+    if holdings.get(symbol) and random.random() < 0.5:
+        return [("sell_shares", {"symbol": symbol, "quantity": 1, "rationale": "load test"})]
+    return [("buy_shares", {"symbol": symbol, "quantity": 1, "rationale": "load test"})]
+
+
+class StubModel(ScriptedModel):
+    """A scripted model that takes as long as a real LLM call would."""
+
+    def __init__(self, name: str, latency: float):
+        super().__init__(name, random_trade, History())
+        self.latency = latency
+
+    async def get_response(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await super().get_response(*args, **kwargs)
+
+
+async def run_level(traders: int, seconds: float, every: float, latency: float) -> dict:
+    names = [f"Load{traders}x{index}" for index in range(traders)]
+    write_traders([
+        {"name": name, "lastname": "Load", "model_name": "stub", "run_every_n_minutes": every / 60}
+        for name in names
+    ])
+    servers = [InProcessMCPServer(accounts_mcp), InProcessMCPServer(market_mcp)]
+    rate = TokenBucket(MAX_TRADER_RUNS_PER_MINUTE / 60) if MAX_TRADER_RUNS_PER_MINUTE else None
+    scheduler = Scheduler(MAX_CONCURRENT_TRADERS, rate=rate)
+    latencies, lags = [], []
+
+    async def cycle(trader: BacktestTrader, job: Job):
+        lags.append(time.monotonic() - job.next_due)
+        start = time.perf_counter()
+        await trader.run_agent(servers, [])
+        latencies.append(time.perf_counter() - start)
+
+    for record in read_traders():
+        if record["name"] not in names:
+            continue
+        trader = BacktestTrader(record["name"], record["lastname"], random_trade, History())
+        trader.model = StubModel(trader.name, latency)
+        cadence = minutes_between_runs(record) * 60
+        job = Job(trader.name, None, every=cadence, jitter=cadence / 10)
+        job.run = lambda trader=trader, job=job: cycle(trader, job)
+        scheduler.add(job)
+    try:
+        await asyncio.wait_for(scheduler.run_forever(), seconds)
+    except TimeoutError:
+        pass
+    accounts.flush()
+    missed = sum(job.missed for job in scheduler.jobs)
+    return {
+        "traders": traders,
+        "cycles": len(latencies),
+        "cycles/hour": len(latencies) / seconds * 3600,
+        "p50 s": float(np.percentile(latencies, 50)) if latencies else None,
+        "p95 s": float(np.percentile(latencies, 95)) if latencies else None,
+        "p95 lag s": float(np.percentile(lags, 95)) if lags else None,
+        "missed": missed,
+    }
+
+
+async def run_load_test(levels: list[int], seconds: float, every: float, latency: float) -> pd.DataFrame:
+    set_tracing_disabled(True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(LOAD_TEST_DB + suffix):
+            os.remove(LOAD_TEST_DB + suffix)
+    use_database(LOAD_TEST_DB)
+    prices = {symbol: random.uniform(20, 500) for symbol in SYMBOLS}
+    market.use_price_feed(lambda symbols: {symbol: prices.get(symbol, 0.0) for symbol in symbols})
+    try:
+        results = [await run_level(traders, seconds, every, latency) for traders in levels]
+    finally:
+        market.use_price_feed(None)
+    return pd.DataFrame(results).set_index("traders")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the trading floor with stubbed models")
+    parser.add_argument("--traders", type=int, nargs="+", default=[4, 16, 64, 256])
+    parser.add_argument("--seconds", type=float, default=30, help="How long to run each trader count")
+    parser.add_argument("--every", type=float, default=5, help="Seconds between each trader's runs")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per stubbed LLM call")
+    args = parser.parse_args()
+
+    print(f"Concurrency limit {MAX_CONCURRENT_TRADERS}, rate limit {MAX_TRADER_RUNS_PER_MINUTE or 'none'} runs/minute")
+    print(asyncio.run(run_load_test(args.traders, args.seconds, args.every, args.latency)).round(2))
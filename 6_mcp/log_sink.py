@@ -0,0 +1,148 @@
+import atexit
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Callable
+from dotenv import load_dotenv
+from database import write_logs, write_spans
+
+load_dotenv(override=True)
+
+QUEUE_SIZE = int(os.getenv("LOG_SINK_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.getenv("LOG_SINK_BATCH_SIZE", "500"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_SINK_FLUSH_SECONDS", "0.25"))
+BLOCK_SECONDS = float(os.getenv("LOG_SINK_BLOCK_SECONDS", "0.05"))
+
+_STOP = object()
+
+
+class LogSink:
+    """
+    Buffers records in a bounded queue and writes them in batches from a background thread,
+    so callers on the agent event loop never wait on a database commit.
+
+    When the queue is full, write() blocks for up to block_seconds to let the writer catch
+    up, then drops the record and counts it in the metrics.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[list[tuple]], None],
+        maxsize: int = QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        interval: float = FLUSH_INTERVAL_SECONDS,
+        block_seconds: float = BLOCK_SECONDS,
+    ):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.interval = interval
+        self.block_seconds = block_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+
+    def write(self, record: tuple) -> bool:
+        """Queue a record for writing; return False if it had to be dropped."""
+        if self._closed:
+            self.writer([record])
+            return True
+        self._ensure_started()
+        try:
+            self._queue.put(record, timeout=self.block_seconds)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def force_flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far has been written; return False on timeout."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush what is queued and stop the writer thread; later writes go straight to the writer."""
+        self.force_flush(timeout)
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            batch, waiters, stop = [], [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self.writer(batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                except Exception as e:
+                    self.errors += 1
+                    self.dropped += len(batch)
+                    print(f"Error writing {len(batch)} log records: {e}")
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+
+logs = LogSink(write_logs)
+atexit.register(logs.shutdown)
+spans = LogSink(write_spans)
+atexit.register(spans.shutdown)
+
+
+def write_log(name: str, type: str, message: str) -> bool:
+    """
+    Queue a log entry for the logs table; a drop-in, non-blocking replacement for
+    database.write_log.
+    """
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return logs.write((name.lower(), now, type, message))
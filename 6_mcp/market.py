@@ -1,11 +1,15 @@
 from polygon import RESTClient
 from dotenv import load_dotenv
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
+import time
 from database import write_market, read_market
 from functools import lru_cache
 from datetime import timezone
+from zoneinfo import ZoneInfo
+from price_cache import PriceCache
+from typing import Callable
 
 load_dotenv(override=True)
 
@@ -15,56 +19,190 @@ polygon_plan = os.getenv("POLYGON_PLAN")
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
+MINUTE_PRICE_TTL_SECONDS = int(os.getenv("MINUTE_PRICE_TTL_SECONDS", "60"))
+# Until Polygon has the latest close, the session before is only cached this long
+EOD_RETRY_SECONDS = int(os.getenv("EOD_RETRY_SECONDS", "300"))
+MARKET_STATUS_TTL_SECONDS = int(os.getenv("MARKET_STATUS_TTL_SECONDS", "300"))
+NEW_YORK = ZoneInfo("America/New_York")
+MARKET_CLOSE_HOUR = 16
+
+price_feed: Callable[[list[str]], dict[str, float]] | None = None
+market_status: tuple[bool, float] | None = None
+eod_market_date: str | None = None
+
+
+class StaleMarketError(Exception):
+    """Polygon doesn't have the close asked for yet; market_data holds the session before."""
+
+    def __init__(self, date: str, market_data: dict[str, float]):
+        super().__init__(f"Polygon only has the close of {date} so far")
+        self.date = date
+        self.market_data = market_data
+
+
+def use_price_feed(feed: Callable[[list[str]], dict[str, float]] | None) -> None:
+    """Take prices from this function instead of Polygon, e.g. historical prices in a backtest"""
+    global price_feed
+    price_feed = feed
 
-def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
-    market_status = client.get_market_status()
-    return market_status.market == "open"
 
+@lru_cache(maxsize=1)
+def get_client() -> RESTClient:
+    return RESTClient(polygon_api_key)
 
-def get_all_share_prices_polygon_eod() -> dict[str, float]:
-    """With much thanks to student Reema R. for fixing the timezone issue with this!"""
-    client = RESTClient(polygon_api_key)
+
+def is_market_open() -> bool:
+    """Whether the market is open, asking Polygon at most once every MARKET_STATUS_TTL_SECONDS"""
+    global market_status
+    now = time.monotonic()
+    if market_status is None or market_status[1] <= now:
+        status = get_client().get_market_status()
+        market_status = (status.market == "open", now + MARKET_STATUS_TTL_SECONDS)
+    return market_status[0]
+
+
+def last_close(now: datetime | None = None) -> datetime:
+    """The most recent weekday 4pm New York close (exchange holidays are not accounted for)"""
+    now = now or datetime.now(NEW_YORK)
+    close = now.astimezone(NEW_YORK).replace(hour=MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0)
+    if close > now:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
+
+
+def next_close(now: datetime | None = None) -> datetime:
+    now = now or datetime.now(NEW_YORK)
+    close = last_close(now) + timedelta(days=1)
+    while close.weekday() >= 5:
+        close += timedelta(days=1)
+    return close
+
+
+def get_all_share_prices_polygon_eod() -> tuple[str, dict[str, float]]:
+    """
+    The date of the latest close Polygon has, and the market at that close.
+    With much thanks to student Reema R. for fixing the timezone issue with this!
+    """
+    client = get_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000, tz=timezone.utc).date()
 
     results = client.get_grouped_daily_aggs(last_close, adjusted=True, include_otc=False)
-    return {result.ticker: result.close for result in results}
+    return last_close.strftime("%Y-%m-%d"), {result.ticker: result.close for result in results}
 
 
 @lru_cache(maxsize=2)
-def get_market_for_prior_date(today):
-    market_data = read_market(today)
+def get_market_for_prior_date(close_date):
+    """The market at the close on this date; raises StaleMarketError, storing nothing, if Polygon doesn't have it yet"""
+    market_data = read_market(close_date)
     if not market_data:
-        market_data = get_all_share_prices_polygon_eod()
-        write_market(today, market_data)
+        date, market_data = get_all_share_prices_polygon_eod()
+        if date != close_date:
+            raise StaleMarketError(date, market_data)
+        write_market(close_date, market_data)
     return market_data
 
 
-def get_share_price_polygon_eod(symbol) -> float:
-    today = datetime.now().date().strftime("%Y-%m-%d")
-    market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+def fetch_share_prices_polygon_eod(symbols) -> dict[str, float]:
+    """
+    End of day prices stay the same until the next close, so the market is keyed by the last close.
+    Just after a close, Polygon may still only have the session before: its prices are used, but
+    eod_expires_at() keeps them for EOD_RETRY_SECONDS rather than until the next close.
+    """
+    global eod_market_date
+    today = last_close().date().strftime("%Y-%m-%d")
+    try:
+        market_data = get_market_for_prior_date(today)
+        eod_market_date = today
+    except StaleMarketError as e:
+        market_data = e.market_data
+        eod_market_date = e.date
+    return {symbol: market_data.get(symbol, 0.0) for symbol in symbols}
+
+
+def eod_expires_at() -> float:
+    """The next close, if the prices last fetched are from the latest close; otherwise soon"""
+    if eod_market_date == last_close().date().strftime("%Y-%m-%d"):
+        return next_close().timestamp()
+    return time.time() + EOD_RETRY_SECONDS
+
+
+def fetch_share_prices_polygon_min(symbols) -> dict[str, float]:
+    """One snapshot request for all the symbols, rather than one per symbol"""
+    results = get_client().get_snapshot_all("stocks", tickers=list(symbols))
+    prices = {symbol: 0.0 for symbol in symbols}
+    for result in results:
+        minute_close = result.min.close if result.min else None
+        prev_close = result.prev_day.close if result.prev_day else 0.0
+        prices[result.ticker] = minute_close or prev_close
+    return prices
+
+
+eod_prices = PriceCache("eod", fetch_share_prices_polygon_eod, expires_at=eod_expires_at)
+min_prices = PriceCache(
+    "min",
+    fetch_share_prices_polygon_min,
+    expires_at=lambda: datetime.now().timestamp() + MINUTE_PRICE_TTL_SECONDS,
+)
+
+
+def get_share_prices_polygon(symbols) -> dict[str, float]:
+    if is_paid_polygon:
+        return min_prices.get_many(symbols)
+    else:
+        return eod_prices.get_many(symbols)
 
 
-def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
-    result = client.get_snapshot_ticker("stocks", symbol)
-    return result.min.close or result.prev_day.close
+async def get_share_prices_polygon_async(symbols) -> dict[str, float]:
+    if is_paid_polygon:
+        return await min_prices.get_many_async(symbols)
+    else:
+        return await eod_prices.get_many_async(symbols)
 
 
 def get_share_price_polygon(symbol) -> float:
-    if is_paid_polygon:
-        return get_share_price_polygon_min(symbol)
-    else:
-        return get_share_price_polygon_eod(symbol)
+    return get_share_prices_polygon([symbol])[symbol]
 
 
 def get_share_price(symbol) -> float:
+    if price_feed:
+        return price_feed([symbol]).get(symbol, 0.0)
     if polygon_api_key:
         try:
             return get_share_price_polygon(symbol)
         except Exception as e:
             print(f"Was not able to use the polygon API due to {e}; using a random number")
     return float(random.randint(1, 100))
+
+
+def get_share_prices(symbols) -> dict[str, float]:
+    """Price several symbols with a single lookup, returning a dict of symbol to price"""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    if price_feed:
+        return price_feed(symbols)
+    if polygon_api_key:
+        try:
+            return get_share_prices_polygon(symbols)
+        except Exception as e:
+            print(f"Was not able to use the polygon API due to {e}; using random numbers")
+    return {symbol: float(random.randint(1, 100)) for symbol in symbols}
+
+
+async def get_share_prices_async(symbols) -> dict[str, float]:
+    """get_share_prices for coroutines: concurrent lookups on one event loop share each fetch"""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    if price_feed:
+        return price_feed(symbols)
+    if polygon_api_key:
+        try:
+            return await get_share_prices_polygon_async(symbols)
+        except Exception as e:
+            print(f"Was not able to use the polygon API due to {e}; using random numbers")
+    return {symbol: float(random.randint(1, 100)) for symbol in symbols}
@@ -1,16 +1,17 @@
 from mcp.server.fastmcp import FastMCP
-from market import get_share_price
+from mcp.types import ToolAnnotations
+from market import get_share_prices_async
 
 mcp = FastMCP("market_server")
 
-@mcp.tool()
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))
 async def lookup_share_price(symbol: str) -> float:
     """This tool provides the current price of the given stock symbol.
 
     Args:
         symbol: the symbol of the stock
     """
-    return get_share_price(symbol)
+    return (await get_share_prices_async([symbol])).get(symbol, 0.0)
 
 if __name__ == "__main__":
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -6,6 +6,8 @@ load_dotenv(override=True)
 
 brave_env = {"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY")}
 polygon_api_key = os.getenv("POLYGON_API_KEY")
+# With SHARED_MEMORY, every trader reads and writes one shared partition of the memory store
+SHARED_MEMORY = os.getenv("SHARED_MEMORY", "false").strip().lower() == "true"
 
 # The MCP server for the Trader to read Market Data
 
@@ -20,27 +22,29 @@ else:
 
 
 # The full set of MCP servers for the trader: Accounts, Push Notification and the Market
+# The accounts server must come first; traders also read their account resources through it
+
+accounts_mcp = {"command": "uv", "args": ["run", "accounts_server.py"]}
 
 trader_mcp_server_params = [
-    {"command": "uv", "args": ["run", "accounts_server.py"]},
+    accounts_mcp,
     {"command": "uv", "args": ["run", "push_server.py"]},
     market_mcp,
 ]
 
-# The full set of MCP servers for the researcher: Fetch, Brave Search and Memory
+# The full set of MCP servers for the researcher: cached Fetch and Brave Search, and Memory
+# One research server and one memory server serve every trader, who is named on each call (see
+# TraderMCPServer in mcp_pool); memory is kept in the database, a partition per trader
+
+
+def use_shard(shard: int, shards: int) -> None:
+    """Tell this worker's accounts server which shard of the traders it serves, so it only matches their orders"""
+    accounts_mcp["env"] = {"TRADING_FLOOR_SHARD": str(shard), "TRADING_FLOOR_SHARDS": str(shards)}
 
 
 def researcher_mcp_server_params(name: str):
+    """The same for every trader, so that the pool shares the servers; the name is passed on each call instead"""
     return [
-        {"command": "uvx", "args": ["mcp-server-fetch"]},
-        {
-            "command": "npx",
-            "args": ["-y", "@modelcontextprotocol/server-brave-search"],
-            "env": brave_env,
-        },
-        {
-            "command": "npx",
-            "args": ["-y", "mcp-memory-libsql"],
-            "env": {"LIBSQL_URL": f"file:./memory/{name}.db"},
-        },
+        {"command": "uv", "args": ["run", "research_server.py"], "env": brave_env},
+        {"command": "uv", "args": ["run", "memory_server.py"], "env": {"SHARED_MEMORY": str(SHARED_MEMORY).lower()}},
     ]
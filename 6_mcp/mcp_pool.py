@@ -0,0 +1,162 @@
+import asyncio
+import json
+import time
+from typing import Any
+from agents.mcp import MCPServer, MCPServerStdio
+from mcp.types import CallToolResult
+
+CLIENT_SESSION_TIMEOUT_SECONDS = 120
+PING_TIMEOUT_SECONDS = 10
+
+
+class MCPServerPool:
+    """
+    MCP servers that are started once and lent to traders on every cycle, instead of being
+    spawned for each run.
+
+    Servers are keyed by their launch parameters, so traders that use identical parameters
+    (all of them: accounts, push, market, research and memory) share one process. Each server
+    is connected and cleaned up by its own task, because the MCP stdio transport must be closed in the task that opened it,
+    and a server that dies must not take its caller down with it.
+    """
+
+    def __init__(self):
+        self._servers: dict[str, MCPServerStdio] = {}
+        self._stops: dict[str, asyncio.Event] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._startup_seconds: dict[str, float] = {}
+        self._lock = asyncio.Lock()
+        self.restarts = 0
+
+    @staticmethod
+    def key(params: dict) -> str:
+        return json.dumps(params, sort_keys=True)
+
+    async def prepare(self, params_per_trader: list[list[dict]]) -> float:
+        """
+        Start missing servers and restart unhealthy ones. Returns the seconds of server
+        startup saved this cycle compared with every trader spawning its own servers.
+        Concurrent calls are serialized, so a shared server is only started once.
+        """
+        async with self._lock:
+            return await self._prepare(params_per_trader)
+
+    async def _prepare(self, params_per_trader: list[list[dict]]) -> float:
+        spent = 0.0
+        unique = {self.key(params): params for params_list in params_per_trader for params in params_list}
+        for key, params in unique.items():
+            server = self._servers.get(key)
+            if server and await self._healthy(server):
+                continue
+            if server:
+                print(f"Restarting MCP server {server.name}")
+                self.restarts += 1
+                await self._stop(key)
+            try:
+                spent += await self._start(key, params)
+            except Exception as e:
+                print(f"Error starting MCP server {params['command']} {' '.join(params['args'])}: {e}")
+        fresh = sum(
+            self._startup_seconds.get(self.key(params), 0.0)
+            for params_list in params_per_trader
+            for params in params_list
+        )
+        return fresh - spent
+
+    def servers(self, params_list: list[dict]) -> list[MCPServerStdio]:
+        """The connected servers for these parameters; raises KeyError if one failed to start."""
+        return [self._servers[self.key(params)] for params in params_list]
+
+    async def close(self) -> None:
+        for key in list(self._servers):
+            await self._stop(key)
+
+    async def _start(self, key: str, params: dict) -> float:
+        start = time.perf_counter()
+        server = MCPServerStdio(params, client_session_timeout_seconds=CLIENT_SESSION_TIMEOUT_SECONDS)
+        ready = asyncio.get_running_loop().create_future()
+        stop = asyncio.Event()
+        task = asyncio.create_task(self._serve(server, ready, stop))
+        await ready
+        elapsed = time.perf_counter() - start
+        self._servers[key] = server
+        self._stops[key] = stop
+        self._tasks[key] = task
+        self._startup_seconds[key] = elapsed
+        return elapsed
+
+    async def _serve(self, server: MCPServerStdio, ready: asyncio.Future, stop: asyncio.Event) -> None:
+        try:
+            await server.connect()
+            ready.set_result(None)
+            await stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            await server.cleanup()
+
+    async def _stop(self, key: str) -> None:
+        server = self._servers.pop(key)
+        self._stops.pop(key).set()
+        task = self._tasks.pop(key)
+        try:
+            await task
+        except BaseException as e:
+            print(f"Error stopping MCP server {server.name}: {e}")
+
+    async def _healthy(self, server: MCPServerStdio) -> bool:
+        if not server.session:
+            return False
+        try:
+            await asyncio.wait_for(server.session.send_ping(), PING_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+
+class TraderMCPServer(MCPServer):
+    """
+    Lends a shared server to one trader. Tools that take a trader argument get the trader's
+    name on every call, and the argument is hidden from the model, so one server can serve
+    everyone and still tell them apart.
+    """
+
+    def __init__(self, server: MCPServer, trader: str):
+        self.server = server
+        self.trader = trader
+        self._takes_trader: set[str] = set()
+
+    @property
+    def name(self) -> str:
+        return self.server.name
+
+    @property
+    def session(self):
+        return self.server.session
+
+    async def connect(self):
+        pass
+
+    async def cleanup(self):
+        pass
+
+    async def list_tools(self, *args, **kwargs):
+        tools = []
+        for tool in await self.server.list_tools(*args, **kwargs):
+            properties = tool.inputSchema.get("properties", {})
+            if "trader" in properties:
+                self._takes_trader.add(tool.name)
+                schema = {
+                    **tool.inputSchema,
+                    "properties": {key: value for key, value in properties.items() if key != "trader"},
+                    "required": [key for key in tool.inputSchema.get("required", []) if key != "trader"],
+                }
+                tool = tool.model_copy(update={"inputSchema": schema})
+            tools.append(tool)
+        return tools
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any] | None) -> CallToolResult:
+        if tool_name in self._takes_trader:
+            arguments = {**(arguments or {}), "trader": self.trader}
+        return await self.server.call_tool(tool_name, arguments)
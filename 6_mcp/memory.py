@@ -0,0 +1,194 @@
+import os
+import re
+import zlib
+import numpy as np
+from dotenv import load_dotenv
+from database import (
+    delete_memory_entity,
+    delete_memory_relation,
+    read_data_version,
+    read_memory_entities,
+    read_memory_relations,
+    read_memory_version,
+    write_memory_entities,
+    write_memory_relations,
+)
+
+load_dotenv(override=True)
+
+EMBEDDING_DIMENSIONS = int(os.getenv("MEMORY_EMBEDDING_DIMENSIONS", "512"))
+RECALL_LIMIT = int(os.getenv("MEMORY_RECALL_LIMIT", "10"))
+WORD = re.compile(r"[a-z0-9$%.&'-]+")
+
+
+def embed(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """
+    A unit vector for the words and word pairs in the text, hashed into a fixed number of
+    dimensions. It needs no model or API call, and the same text gives the same vector in
+    every process.
+    """
+    words = [word.strip(".'-") for word in WORD.findall(text.lower())]
+    words = [word for word in words if word]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in features:
+        hashed = zlib.crc32(feature.encode())
+        vector[hashed % dimensions] += 1.0 if hashed & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def describe(name: str, entity_type: str, observations: list[str]) -> str:
+    return " ".join([name, entity_type, *observations])
+
+
+class VectorIndex:
+    """
+    Cosine similarity search over unit vectors held in one NumPy matrix.
+
+    Inserts write into spare rows, and the matrix doubles in size when it fills, so adding
+    an entity costs O(1) amortized; a search is one matrix-vector product.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS, capacity: int = 64):
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.names: list[str | None] = []
+        self.rows: dict[str, int] = {}
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, name: str, vector: np.ndarray) -> None:
+        row = self.rows.get(name)
+        if row is None:
+            row = self._free.pop() if self._free else self._append()
+            self.names[row] = name
+            self.rows[name] = row
+        self.vectors[row] = vector
+
+    def remove(self, name: str) -> None:
+        row = self.rows.pop(name, None)
+        if row is not None:
+            self.vectors[row] = 0.0
+            self.names[row] = None
+            self._free.append(row)
+
+    def search(self, vector: np.ndarray, limit: int) -> list[tuple[str, float]]:
+        """The names of the nearest vectors with a positive similarity, most similar first."""
+        count = len(self.names)
+        if not count:
+            return []
+        scores = self.vectors[:count] @ vector
+        limit = min(limit, count)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(self.names[row], float(scores[row])) for row in top if scores[row] > 0 and self.names[row]]
+
+    def _append(self) -> int:
+        row = len(self.names)
+        if row == len(self.vectors):
+            grown = np.zeros((2 * len(self.vectors), self.vectors.shape[1]), dtype=np.float32)
+            grown[:row] = self.vectors
+            self.vectors = grown
+        self.names.append(None)
+        return row
+
+
+class MemoryStore:
+    """
+    A knowledge graph of entities, with their observations, and the relations between them,
+    kept in one partition of the shared database (one per trader, or one for everyone).
+
+    The index is kept in step with the database: before each recall, PRAGMA data_version shows
+    whether another process has written anything, and if so one indexed query checks whether
+    this partition changed. Only the entities written since are loaded, unless another process
+    deleted some, which means a full reload.
+    """
+
+    def __init__(self, partition: str):
+        self.partition = partition
+        self.index = VectorIndex()
+        self._version = (0, 0)
+        self._data_version = None
+
+    def sync(self, written: bool = False) -> None:
+        """Bring the index up to date; written means this process has just changed the partition."""
+        data_version = read_data_version()
+        if data_version == self._data_version and not written:
+            return
+        self._data_version = data_version
+        version = read_memory_version(self.partition)
+        if version == self._version:
+            return
+        for entity in read_memory_entities(self.partition, after_id=self._version[1]):
+            self.index.add(entity["name"], np.frombuffer(entity["embedding"], dtype=np.float32))
+        if len(self.index) != version[0]:
+            self.index = VectorIndex()
+            for entity in read_memory_entities(self.partition):
+                self.index.add(entity["name"], np.frombuffer(entity["embedding"], dtype=np.float32))
+        self._version = version
+
+    def create_entities(self, entities: list[dict]) -> list[str]:
+        """
+        Add entities, each a dict with name, entityType and observations. Observations of an
+        entity that already exists are added to the ones it has.
+        """
+        existing = {
+            entity["name"]: entity
+            for entity in read_memory_entities(self.partition, names=[entity["name"] for entity in entities])
+        }
+        rows = []
+        for entity in entities:
+            observations = list(existing.get(entity["name"], {}).get("observations", []))
+            observations += [observation for observation in entity["observations"] if observation not in observations]
+            vector = embed(describe(entity["name"], entity["entityType"], observations))
+            rows.append((entity["name"], entity["entityType"], observations, vector.tobytes()))
+        write_memory_entities(self.partition, rows)
+        self.sync(written=True)
+        return [name for name, *_ in rows]
+
+    def create_relations(self, relations: list[dict]) -> int:
+        """Add relations, each a dict with source, target and type."""
+        write_memory_relations(
+            self.partition, [(relation["source"], relation["target"], relation["type"]) for relation in relations]
+        )
+        return len(relations)
+
+    def search_nodes(self, query: str, limit: int = RECALL_LIMIT) -> dict:
+        """The entities most similar to the query, or named by it, with their relations."""
+        self.sync()
+        names = [name for name, _ in self.index.search(embed(query), limit)]
+        if query in self.index.rows and query not in names:
+            names = [query] + names[:limit - 1]
+        return self._graph(names)
+
+    def read_graph(self) -> dict:
+        return self._graph(None)
+
+    def delete_entity(self, name: str) -> None:
+        delete_memory_entity(self.partition, name)
+        self.index.remove(name)
+        self.sync(written=True)
+
+    def delete_relation(self, source: str, target: str, relation_type: str) -> None:
+        delete_memory_relation(self.partition, source, target, relation_type)
+
+    def _graph(self, names: list[str] | None) -> dict:
+        if names == []:
+            return {"entities": [], "relations": []}
+        entities = read_memory_entities(self.partition, names=names)
+        if names is not None:
+            order = {name: position for position, name in enumerate(names)}
+            entities.sort(key=lambda entity: order[entity["name"]])
+        relations = read_memory_relations(self.partition, names=names)
+        return {
+            "entities": [
+                {"name": entity["name"], "entityType": entity["entity_type"], "observations": entity["observations"]}
+                for entity in entities
+            ],
+            "relations": [
+                {"source": source, "target": target, "relationType": relation_type}
+                for source, target, relation_type in relations
+            ],
+        }
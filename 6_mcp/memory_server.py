@@ -0,0 +1,110 @@
+import json
+import os
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+from mcp.server.fastmcp import FastMCP
+from memory import MemoryStore
+
+load_dotenv(override=True)
+
+# One server serves every trader, each in their own partition of the memory store, named by the
+# trader argument of each call; with SHARED_MEMORY, or for calls that name no trader, they share one
+SHARED_MEMORY = os.getenv("SHARED_MEMORY", "false").strip().lower() == "true"
+DEFAULT_PARTITION = os.getenv("MEMORY_PARTITION", "shared").lower()
+stores: dict[str, MemoryStore] = {}
+
+mcp = FastMCP("memory_server")
+
+
+def memory(trader: str) -> MemoryStore:
+    partition = trader.lower() if trader and not SHARED_MEMORY else DEFAULT_PARTITION
+    if partition not in stores:
+        stores[partition] = MemoryStore(partition)
+    return stores[partition]
+
+
+class Entity(BaseModel):
+    name: str
+    entityType: str
+    observations: list[str] = Field(default_factory=list)
+
+
+class Relation(BaseModel):
+    source: str
+    target: str
+    type: str
+
+
+@mcp.tool()
+async def create_entities(entities: list[Entity], trader: str = "") -> str:
+    """Create new entities with observations, or add observations to existing ones.
+
+    Args:
+        entities: The entities, each with a name, an entityType and a list of observations
+        trader: The trader whose memory this is; filled in by the trading floor
+    """
+    names = memory(trader).create_entities([entity.model_dump() for entity in entities])
+    return f"Created or updated {len(names)} entities: {', '.join(names)}"
+
+
+@mcp.tool()
+async def search_nodes(query: str, trader: str = "") -> str:
+    """Recall the entities most relevant to a query, with their observations and relations.
+
+    Args:
+        query: What to search the knowledge graph for, in words
+        trader: The trader whose memory this is; filled in by the trading floor
+    """
+    return json.dumps(memory(trader).search_nodes(query))
+
+
+@mcp.tool()
+async def read_graph(trader: str = "") -> str:
+    """Read the entire knowledge graph.
+
+    Args:
+        trader: The trader whose memory this is; filled in by the trading floor
+    """
+    return json.dumps(memory(trader).read_graph())
+
+
+@mcp.tool()
+async def create_relations(relations: list[Relation], trader: str = "") -> str:
+    """Create relations between entities.
+
+    Args:
+        relations: The relations, each with a source and a target entity name, and a type
+        trader: The trader whose memory this is; filled in by the trading floor
+    """
+    count = memory(trader).create_relations([relation.model_dump() for relation in relations])
+    return f"Created {count} relations"
+
+
+@mcp.tool()
+async def delete_entity(name: str, trader: str = "") -> str:
+    """Delete an entity, its observations and all of its relations.
+
+    Args:
+        name: The name of the entity
+        trader: The trader whose memory this is; filled in by the trading floor
+    """
+    memory(trader).delete_entity(name)
+    return f"Deleted entity {name}"
+
+
+@mcp.tool()
+async def delete_relation(source: str, target: str, type: str, trader: str = "") -> str:
+    """Delete one relation between two entities.
+
+    Args:
+        source: The name of the source entity
+        target: The name of the target entity
+        type: The type of the relation
+        trader: The trader whose memory this is; filled in by the trading floor
+    """
+    memory(trader).delete_relation(source, target, type)
+    return f"Deleted relation {source} {type} {target}"
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
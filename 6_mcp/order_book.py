@@ -0,0 +1,93 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+import clock
+from accounts import Order, TIMESTAMP_FORMAT
+from account_cache import AccountCache
+from connection_pool import transaction
+from database import read_orders, update_orders
+from market import get_share_prices
+from shards import SHARD, SHARDS, shard_of
+
+load_dotenv(override=True)
+
+MATCH_INTERVAL_SECONDS = float(os.getenv("ORDER_MATCH_SECONDS", "60"))
+
+
+class OrderBook:
+    """
+    Matches the open limit and stop orders of one shard's accounts in batches.
+
+    Each tick reads the shard's open orders, prices their symbols with one batched lookup,
+    expires day orders past their close, and fills the triggered orders. The fills,
+    the order updates and the accounts they touched are written in a single
+    transaction; if it fails, the cached accounts are restored as well. Orders that can no
+    longer be filled (e.g. not enough cash) are rejected with a note rather than retried.
+
+    Each worker of the trading floor runs its own accounts server, so only the server that
+    serves an account's trader matches its orders. Each order is also claimed, inside the
+    transaction, before it is filled; an order that another process closed since it was
+    read is skipped.
+    """
+
+    def __init__(self, accounts: AccountCache, shard: int = SHARD, shards: int = SHARDS):
+        self.accounts = accounts
+        self.shard = shard
+        self.shards = shards
+        self.filled = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def match(self) -> dict[str, int]:
+        """Run one matching tick; returns how many orders were filled, expired and rejected."""
+        orders = [
+            Order(**order) for order in read_orders(status="open")
+            if shard_of(order["name"], self.shards) == self.shard
+        ]
+        if not orders:
+            return {"filled": 0, "expired": 0, "rejected": 0}
+        now = clock.now().strftime(TIMESTAMP_FORMAT)
+        live = [order for order in orders if not order.expired(now)]
+        expiries = [(order.id, "expired", None, now, None) for order in orders if order.expired(now)]
+        prices = get_share_prices(sorted({order.symbol for order in live})) if live else {}
+        filled = rejected = 0
+        snapshots = {}
+        try:
+            with transaction():
+                for order in live:
+                    price = prices.get(order.symbol, 0.0)
+                    if not price or not order.triggered(price):
+                        continue
+                    if not update_orders([(order.id, "filled", price, now, None)]):
+                        continue
+                    account = self.accounts.get(order.name)
+                    if account.name not in snapshots:
+                        snapshots[account.name] = (account, account.snapshot())
+                    try:
+                        account.fill_order(order, price)
+                        filled += 1
+                    except ValueError as e:
+                        update_orders([(order.id, "rejected", None, now, str(e))], status="filled")
+                        rejected += 1
+                expired = update_orders(expiries)
+                self.accounts.flush()
+        except BaseException:
+            # The orders roll back to open, so the fills must be undone in the cached accounts
+            # too, or the next tick would fill them again
+            for account, snapshot in snapshots.values():
+                account.restore(snapshot)
+            raise
+        result = {"filled": filled, "expired": expired, "rejected": rejected}
+        self.filled += result["filled"]
+        self.expired += result["expired"]
+        self.rejected += result["rejected"]
+        return result
+
+    async def run(self, interval: float = MATCH_INTERVAL_SECONDS) -> None:
+        """Match open orders every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.match()
+            except Exception as e:
+                print(f"Error matching orders: {e}")
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from typing import Callable
+from database import read_prices, write_prices
+
+FOLLOWER_TIMEOUT_SECONDS = 30
+
+
+class PriceCache:
+    """
+    Share prices for one data plan, cached until an expiry chosen per plan.
+
+    Lookups check this process first, then the prices table shared by every process
+    (market server, accounts server and UI), and only then call fetch for the symbols
+    still missing. Concurrent lookups of the same symbol are coalesced: one thread
+    fetches while the others wait for its result. Coroutines use get_many_async, which
+    coalesces lookups on the same event loop with a future per symbol.
+    """
+
+    def __init__(self, plan: str, fetch: Callable[[list[str]], dict[str, float]], expires_at: Callable[[], float]):
+        self.plan = plan
+        self.fetch = fetch
+        self.expires_at = expires_at
+        self._prices: dict[str, tuple[float, float]] = {}
+        self._inflight: dict[str, threading.Event] = {}
+        self._futures: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.coalesced = 0
+        self.fetches = 0
+
+    def get_many(self, symbols: list[str]) -> dict[str, float]:
+        now = time.time()
+        result = {}
+        with self._lock:
+            for symbol in symbols:
+                entry = self._prices.get(symbol)
+                if entry and entry[1] > now:
+                    result[symbol] = entry[0]
+            self.hits += len(result)
+
+        missing = [symbol for symbol in symbols if symbol not in result]
+        if missing:
+            shared = read_prices(self.plan, missing, now)
+            with self._lock:
+                self._prices.update(shared)
+                self.shared_hits += len(shared)
+            result.update({symbol: price for symbol, (price, _) in shared.items()})
+
+        leading, following = [], []
+        with self._lock:
+            for symbol in symbols:
+                if symbol in result:
+                    continue
+                if symbol in self._inflight:
+                    following.append((symbol, self._inflight[symbol]))
+                else:
+                    self._inflight[symbol] = threading.Event()
+                    leading.append(symbol)
+
+        try:
+            if leading:
+                fetched = self.fetch(leading)
+                expires = self.expires_at()
+                with self._lock:
+                    self._prices.update({symbol: (price, expires) for symbol, price in fetched.items()})
+                    self.fetches += 1
+                write_prices(self.plan, fetched, expires)
+                result.update(fetched)
+        finally:
+            with self._lock:
+                for symbol in leading:
+                    self._inflight.pop(symbol).set()
+
+        for symbol, done in following:
+            done.wait(FOLLOWER_TIMEOUT_SECONDS)
+            entry = self._prices.get(symbol)
+            if entry:
+                result[symbol] = entry[0]
+                self.coalesced += 1
+            else:
+                result.update(self.fetch([symbol]))
+        return result
+
+    async def get_many_async(self, symbols: list[str]) -> dict[str, float]:
+        """
+        get_many for coroutines: symbols cached in this process are answered without leaving the
+        loop, the rest are looked up by get_many in a worker thread. A coroutine asking for a
+        symbol that another coroutine on the same loop is already looking up awaits its future.
+        """
+        loop = asyncio.get_running_loop()
+        now = time.time()
+        result, leading, following = {}, [], []
+        with self._lock:
+            for symbol in symbols:
+                entry = self._prices.get(symbol)
+                if entry and entry[1] > now:
+                    result[symbol] = entry[0]
+                elif (loop, symbol) in self._futures:
+                    following.append((symbol, self._futures[(loop, symbol)]))
+                else:
+                    leading.append(symbol)
+            self.hits += len(result)
+
+        if leading:
+            futures = {symbol: loop.create_future() for symbol in leading}
+            self._futures.update({(loop, symbol): future for symbol, future in futures.items()})
+            try:
+                fetched = await asyncio.to_thread(self.get_many, leading)
+                result.update(fetched)
+                for symbol, future in futures.items():
+                    future.set_result(fetched.get(symbol, 0.0))
+            except BaseException as e:
+                for future in futures.values():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+                        future.exception()  # retrieved, so a future no one awaited doesn't warn
+                raise
+            finally:
+                for symbol in leading:
+                    self._futures.pop((loop, symbol), None)
+
+        for symbol, future in following:
+            result[symbol] = await future
+            self.coalesced += 1
+        return result
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "coalesced": self.coalesced,
+            "fetches": self.fetches,
+        }
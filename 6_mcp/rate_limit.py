@@ -0,0 +1,227 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+import openai
+from agents import Model, ModelResponse
+from dotenv import load_dotenv
+from shards import SHARD, SHARDS, share_of
+
+load_dotenv(override=True)
+
+DEFAULT_REQUESTS_PER_MINUTE = os.getenv("DEFAULT_REQUESTS_PER_MINUTE", "500")
+DEFAULT_TOKENS_PER_MINUTE = os.getenv("DEFAULT_TOKENS_PER_MINUTE", "1000000")
+DEFAULT_MAX_CONCURRENT = os.getenv("DEFAULT_MAX_CONCURRENT", "16")
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """
+    Allows rate acquisitions per second on average, in bursts of up to capacity.
+
+    acquire() waits until a token is free; waiters are served in the order they arrived.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError(f"A token bucket's rate must be positive, not {rate}")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                delay = (tokens - self._tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= tokens
+
+    def charge(self, tokens: float) -> None:
+        """Take tokens without waiting; the bucket can go into debt, which later acquisitions repay."""
+        self._refill()
+        self._tokens -= tokens
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+def _retry_after_seconds(error: openai.APIStatusError) -> float | None:
+    """The wait the provider asked for in its retry-after-ms or retry-after header, if any."""
+    headers = error.response.headers if error.response is not None else {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _retryable(error: openai.APIError) -> bool:
+    """Whether the OpenAI SDK would retry this error: a lost connection, a timeout, 408, 409, 429 or 5xx."""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    return isinstance(error, openai.APIStatusError) and (
+        error.status_code in (408, 409, 429) or error.status_code >= 500
+    )
+
+
+class ProviderLimiter:
+    """
+    Request, token and concurrency limits for one provider, shared by every agent in the
+    process, whichever of the provider's models it uses.
+
+    Calls wait for a request token, an estimate of their LLM tokens, and a concurrency slot.
+    When the provider answers 429, every caller of this limiter pauses for the retry-after the
+    provider asked for (or an exponential backoff), and the call is retried.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float, max_concurrent: int):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute / 60, capacity=max(1.0, requests_per_minute / 6))
+        self.tokens = TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute / 6)
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._paused_until = 0.0
+        self.calls = 0
+        self.rate_limited = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        start = time.monotonic()
+        await self.requests.acquire()
+        await self.tokens.acquire(min(estimated_tokens, self.tokens.capacity))
+        async with self._slots:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            waited = time.monotonic() - start
+            self.calls += 1
+            self.queue_seconds += waited
+            self.max_queue_seconds = max(self.max_queue_seconds, waited)
+            yield
+
+    def back_off(self, error: openai.RateLimitError, attempt: int) -> float:
+        self.rate_limited += 1
+        delay = _retry_after_seconds(error) or min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def used(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Charge tokens used beyond the estimate, so later calls wait for them."""
+        if actual_tokens > estimated_tokens:
+            self.tokens.charge(actual_tokens - estimated_tokens)
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "mean_queue_seconds": self.queue_seconds / self.calls if self.calls else 0.0,
+            "max_queue_seconds": self.max_queue_seconds,
+        }
+
+
+limiters: dict[str, ProviderLimiter] = {}
+# The provider limits are for the whole trading floor; each worker gets its shard's share
+shard, shards = SHARD, SHARDS
+
+
+def share_limits(worker_shard: int, worker_shards: int) -> None:
+    """Give this worker its shard's share of every provider limit, for limiters made from now on"""
+    global shard, shards
+    shard, shards = worker_shard, worker_shards
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """
+    The limiter for this provider, configured from e.g. DEEPSEEK_REQUESTS_PER_MINUTE,
+    DEEPSEEK_TOKENS_PER_MINUTE and DEEPSEEK_MAX_CONCURRENT. These are the provider's quotas, so
+    every model of the provider shares them, and they are split between the shards.
+    """
+    if provider not in limiters:
+        prefix = provider.upper()
+        requests_per_minute = float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE))
+        tokens_per_minute = float(os.getenv(f"{prefix}_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE))
+        max_concurrent = int(os.getenv(f"{prefix}_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT))
+        if requests_per_minute <= 0 or tokens_per_minute <= 0 or max_concurrent <= 0:
+            raise ValueError(
+                f"{prefix}_REQUESTS_PER_MINUTE, {prefix}_TOKENS_PER_MINUTE and {prefix}_MAX_CONCURRENT must be positive"
+            )
+        max_concurrent = share_of(max_concurrent, shard, shards)
+        if not max_concurrent:
+            print(f"Shard {shard + 1} of {shards} gets none of the {prefix}_MAX_CONCURRENT calls, so its calls will wait")
+        limiters[provider] = ProviderLimiter(
+            provider, requests_per_minute / shards, tokens_per_minute / shards, max_concurrent
+        )
+    return limiters[provider]
+
+
+class RateLimitedModel(Model):
+    """
+    A Model that sends every call through a ProviderLimiter, and retries the errors the OpenAI
+    SDK would (its clients are made with max_retries=0, so retries aren't doubled up).
+    A 429 pauses every caller of the limiter; other errors only delay the call that failed.
+    A stream is only retried if it failed before its first event.
+    """
+
+    def __init__(self, model: Model, limiter: ProviderLimiter):
+        self.model = model
+        self.limiter = limiter
+
+    @staticmethod
+    def estimate_tokens(system_instructions, input) -> int:
+        text = (system_instructions or "") + (input if isinstance(input, str) else json.dumps(input, default=str))
+        return len(text) // CHARS_PER_TOKEN
+
+    async def get_response(self, system_instructions, input, *args, **kwargs) -> ModelResponse:
+        estimate = self.estimate_tokens(system_instructions, input)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self.limiter.slot(estimate):
+                    response = await self.model.get_response(system_instructions, input, *args, **kwargs)
+                self.limiter.used(estimate, response.usage.total_tokens)
+                return response
+            except openai.APIError as e:
+                await self._before_retry(e, attempt)
+
+    async def stream_response(self, system_instructions, input, *args, **kwargs):
+        estimate = self.estimate_tokens(system_instructions, input)
+        for attempt in range(MAX_RETRIES + 1):
+            started = False
+            try:
+                async with self.limiter.slot(estimate):
+                    async for event in self.model.stream_response(system_instructions, input, *args, **kwargs):
+                        started = True
+                        yield event
+                return
+            except openai.APIError as e:
+                if started:
+                    raise
+                await self._before_retry(e, attempt)
+
+    async def _before_retry(self, error: openai.APIError, attempt: int) -> None:
+        """Wait before retrying a call that failed with this error; re-raise it if it shouldn't be retried."""
+        if attempt == MAX_RETRIES or not _retryable(error):
+            raise error
+        if isinstance(error, openai.RateLimitError):
+            delay = self.limiter.back_off(error, attempt)
+            print(f"Rate limited by {self.limiter.name}; retrying in {delay:.1f}s")
+            return
+        retry_after = _retry_after_seconds(error) if isinstance(error, openai.APIStatusError) else None
+        delay = retry_after or min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+        print(f"{type(error).__name__} from {self.limiter.name}; retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+import httpx
+import markdownify
+import readabilipy.simple_json
+from dotenv import load_dotenv
+from database import prune_research, read_research, write_research
+
+load_dotenv(override=True)
+
+brave_api_key = os.getenv("BRAVE_API_KEY")
+
+RESEARCH_CACHE_DIR = os.getenv("RESEARCH_CACHE_DIR", "research_cache")
+TTL_MINUTES = {
+    "fetch": float(os.getenv("RESEARCH_FETCH_TTL_MINUTES", "240")),
+    "search": float(os.getenv("RESEARCH_SEARCH_TTL_MINUTES", "30")),
+}
+# Files younger than this are never pruned: they may be still being written, or stored but not yet indexed
+PRUNE_GRACE_MINUTES = float(os.getenv("RESEARCH_PRUNE_GRACE_MINUTES", "10"))
+FETCH_TIMEOUT_SECONDS = 30
+USER_AGENT = "ModelContextProtocol/1.0 (Autonomous; +https://github.com/modelcontextprotocol/servers)"
+BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/web/search"
+
+
+class ResearchCache:
+    """
+    Fetched pages and search results, shared by every trader and every process.
+
+    Text is stored once per content hash in a directory of files, and the research table maps
+    each request (a URL, or a search query) to the hash until that source's TTL runs out.
+    Concurrent misses for the same request in one process are coalesced into one fetch.
+    """
+
+    def __init__(self, directory: str = RESEARCH_CACHE_DIR):
+        self.directory = Path(directory)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    def path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest
+
+    def store(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        path = self.path(digest)
+        if path.exists():
+            # Reusing a file restarts its grace period, so a concurrent prune leaves it alone
+            path.touch()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix(f".{os.getpid()}.tmp")
+            temporary.write_text(text, encoding="utf-8")
+            temporary.replace(path)
+        return digest
+
+    def load(self, key: str) -> tuple[str, float] | None:
+        entry = read_research(key, time.time())
+        if entry:
+            digest, seconds = entry
+            try:
+                return self.path(digest).read_text(encoding="utf-8"), seconds
+            except FileNotFoundError:
+                pass
+        return None
+
+    async def get(self, source: str, key: str, fetch: Callable[[], Awaitable[str]]) -> tuple[str, bool]:
+        """The text for this request, fetched only on a miss; also returns whether it was a hit."""
+        key = f"{source}:{key}"
+        cached = self.load(key)
+        if cached:
+            self.hits += 1
+            self.seconds_saved += cached[1]
+            return cached[0], True
+        if key in self._inflight:
+            self.hits += 1
+            return await asyncio.shield(self._inflight[key]), True
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            start = time.perf_counter()
+            text = await fetch()
+            seconds = time.perf_counter() - start
+            write_research(key, source, self.store(text), seconds, time.time() + TTL_MINUTES[source] * 60)
+            self.misses += 1
+            future.set_result(text)
+            return text, False
+        except Exception as e:
+            # Failures are passed to any waiting callers but never cached
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._inflight[key]
+
+    def prune(self, grace_minutes: float = PRUNE_GRACE_MINUTES) -> int:
+        """
+        Forget expired requests and delete the files no request refers to any more. Other
+        processes may be storing files meanwhile, so any file modified within the grace period
+        is kept, including temporary files still being written; older temporary files were
+        left by a process that died and are deleted.
+        """
+        now = time.time()
+        referenced = prune_research(now)
+        removed = 0
+        for path in self.directory.glob("*/*"):
+            if path.name in referenced:
+                continue
+            try:
+                if path.stat().st_mtime > now - grace_minutes * 60:
+                    continue
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def extract_text(html: str) -> str:
+    """Simplify an HTML page to Markdown, the way mcp-server-fetch does."""
+    simplified = readabilipy.simple_json.simple_json_from_html_string(html, use_readability=True)
+    if not simplified["content"]:
+        return "<error>Page failed to be simplified from HTML</error>"
+    return markdownify.markdownify(simplified["content"], heading_style=markdownify.ATX)
+
+
+async def fetch_page(url: str, raw: bool = False) -> str:
+    async with httpx.AsyncClient(follow_redirects=True, timeout=FETCH_TIMEOUT_SECONDS) as client:
+        response = await client.get(url, headers={"User-Agent": USER_AGENT})
+    if response.status_code >= 400:
+        raise ValueError(f"Failed to fetch {url} - status code {response.status_code}")
+    content_type = response.headers.get("content-type", "")
+    is_html = "<html" in response.text[:100] or "text/html" in content_type or not content_type
+    if is_html and not raw:
+        return extract_text(response.text)
+    return response.text
+
+
+async def search_web(query: str, count: int = 10, offset: int = 0) -> str:
+    async with httpx.AsyncClient(timeout=FETCH_TIMEOUT_SECONDS) as client:
+        response = await client.get(
+            BRAVE_SEARCH_URL,
+            params={"q": query, "count": min(count, 20), "offset": offset},
+            headers={"Accept": "application/json", "X-Subscription-Token": brave_api_key or ""},
+        )
+    if response.status_code >= 400:
+        raise ValueError(f"Brave API error: {response.status_code} {response.reason_phrase}\n{response.text}")
+    results = response.json().get("web", {}).get("results", [])
+    return "\n\n".join(
+        f"Title: {result.get('title', '')}\nDescription: {result.get('description', '')}\nURL: {result.get('url', '')}"
+        for result in results
+    ) or "No results found"
@@ -0,0 +1,63 @@
+from dotenv import load_dotenv
+from mcp.server.fastmcp import FastMCP
+from log_sink import write_log
+from research import ResearchCache, fetch_page, search_web
+
+load_dotenv(override=True)
+
+mcp = FastMCP("research_server")
+cache = ResearchCache()
+
+
+def log_lookup(trader: str, source: str, request: str, hit: bool) -> None:
+    """Log a lookup to the trader it was for, so cache hits show in that trader's logs"""
+    outcome = "hit" if hit else "miss"
+    message = (
+        f"{source} {outcome}: {request[:80]} - hit rate {cache.hit_rate():.0%} "
+        f"({cache.hits}/{cache.hits + cache.misses}), {cache.seconds_saved:.1f}s saved"
+    )
+    if trader:
+        write_log(trader, "research", message)
+
+
+@mcp.tool()
+async def fetch(url: str, max_length: int = 5000, start_index: int = 0, raw: bool = False, trader: str = "") -> str:
+    """Fetches a URL from the internet and extracts its contents as markdown.
+
+    Args:
+        url: URL to fetch
+        max_length: Maximum number of characters to return
+        start_index: Return output starting at this character index, to read the rest of a long page
+        raw: Get the actual HTML content of the requested page, without simplification
+        trader: The trader this research is for; filled in by the trading floor
+    """
+    text, hit = await cache.get("fetch", f"{int(raw)}:{url}", lambda: fetch_page(url, raw))
+    log_lookup(trader, "fetch", url, hit)
+    if start_index >= len(text):
+        return "<error>No more content available.</error>"
+    content = text[start_index:start_index + max_length]
+    end = start_index + len(content)
+    if end < len(text):
+        content += f"\n\n<error>Content truncated. Call the fetch tool with a start_index of {end} to get more content.</error>"
+    return f"Contents of {url}:\n{content}"
+
+
+@mcp.tool()
+async def brave_web_search(query: str, count: int = 10, offset: int = 0, trader: str = "") -> str:
+    """Performs a web search using the Brave Search API, for general queries, news, articles and online content.
+
+    Args:
+        query: Search query
+        count: Number of results (1-20, default 10)
+        offset: Pagination offset
+        trader: The trader this research is for; filled in by the trading floor
+    """
+    normalized = " ".join(query.lower().split())
+    text, hit = await cache.get("search", f"{count}:{offset}:{normalized}", lambda: search_web(query, count, offset))
+    log_lookup(trader, "search", query, hit)
+    return text
+
+
+if __name__ == "__main__":
+    cache.prune()
+    mcp.run(transport="stdio")
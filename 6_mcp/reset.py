@@ -1,4 +1,28 @@
-from accounts import Account
+"""
+Reset the traders' accounts, or seed many accounts at once from a file.
+
+    uv run reset.py                                  # the four default traders
+    uv run reset.py traders.yaml [--clear-logs] [--clear-memory]
+    uv run reset.py traders.csv [--clear-logs] [--clear-memory]
+
+A seed file lists traders with a name and a strategy, and optionally a balance, and the
+lastname, model_name, short_model_name, run_every_n_minutes and enabled fields of the
+trader registry. Traders with a model_name are also added to the registry. A YAML file
+holds a list of traders, or a mapping with a "traders" list; a CSV file has a header row.
+
+Stop the trading floor first. Its accounts servers cache accounts, and one holding unsaved
+changes would write them back over the reset; so this script refuses to run while any
+shard of the floor has recorded a heartbeat in the last three TRADING_FLOOR_HEARTBEAT_SECONDS.
+"""
+
+import argparse
+import csv
+import time
+import clock
+from accounts import INITIAL_BALANCE, TIMESTAMP_FORMAT
+from connection_pool import transaction
+from database import read_floor_heartbeats, reset_accounts, write_traders
+from shards import HEARTBEAT_SECONDS
 
 waren_strategy = """
 You are Warren, and you are named in homage to your role model, Warren Buffett.
@@ -39,12 +63,75 @@ You focus your trading on crypto ETFs.
 """
 
 
+def load_seed(path: str) -> list[dict]:
+    """Read the traders in a YAML or CSV seed file."""
+    if path.endswith((".yaml", ".yml")):
+        import yaml
+
+        with open(path) as f:
+            data = yaml.safe_load(f) or []
+        traders = data.get("traders", []) if isinstance(data, dict) else data
+    else:
+        with open(path, newline="") as f:
+            traders = [{key: value for key, value in row.items() if value not in (None, "")} for row in csv.DictReader(f)]
+    for trader in traders:
+        if not trader.get("name") or "strategy" not in trader:
+            raise ValueError(f"Every trader in {path} needs a name and a strategy: {trader}")
+        if "enabled" in trader and isinstance(trader["enabled"], str):
+            trader["enabled"] = trader["enabled"].strip().lower() in ("1", "true", "yes")
+    return traders
+
+
+def running_shards() -> list[tuple[int, int, float]]:
+    """The (shard, pid, beat) of every shard of the trading floor that is still running"""
+    return read_floor_heartbeats(time.time() - 3 * HEARTBEAT_SECONDS)
+
+
+def seed_traders(traders: list[dict], clear_logs: bool = False, clear_memory: bool = False) -> None:
+    """Create or reset every trader's account, and register those with a model, in one transaction."""
+    registry = [
+        {
+            **trader,
+            "lastname": trader.get("lastname", "Trader"),
+            "run_every_n_minutes": float(trader["run_every_n_minutes"]) if trader.get("run_every_n_minutes") else None,
+        }
+        for trader in traders
+        if trader.get("model_name")
+    ]
+    accounts = [
+        (trader["name"], float(trader.get("balance", INITIAL_BALANCE)), trader["strategy"])
+        for trader in traders
+    ]
+    now = clock.now().strftime(TIMESTAMP_FORMAT)
+    with transaction():
+        if registry:
+            write_traders(registry)
+        reset_accounts(accounts, now, clear_logs=clear_logs, clear_memory=clear_memory)
+
+
 def reset_traders():
-    Account.get("Warren").reset(waren_strategy)
-    Account.get("George").reset(george_strategy)
-    Account.get("Ray").reset(ray_strategy)
-    Account.get("Cathie").reset(cathie_strategy)
+    seed_traders([
+        {"name": "Warren", "strategy": waren_strategy},
+        {"name": "George", "strategy": george_strategy},
+        {"name": "Ray", "strategy": ray_strategy},
+        {"name": "Cathie", "strategy": cathie_strategy},
+    ])
 
 
 if __name__ == "__main__":
-    reset_traders()
+    parser = argparse.ArgumentParser(description="Reset the default traders, or seed traders from a YAML or CSV file")
+    parser.add_argument("seed", nargs="?", help="A YAML or CSV file of traders and their strategies")
+    parser.add_argument("--clear-logs", action="store_true", help="Also delete the traders' logs and trace spans")
+    parser.add_argument("--clear-memory", action="store_true", help="Also delete each trader's own memory")
+    args = parser.parse_args()
+
+    running = running_shards()
+    if running:
+        shards = ", ".join(f"shard {shard + 1} (pid {pid})" for shard, pid, _ in running)
+        parser.exit(1, f"The trading floor is running: {shards}. Stop it before resetting accounts.\n")
+    if args.seed:
+        traders = load_seed(args.seed)
+        seed_traders(traders, clear_logs=args.clear_logs, clear_memory=args.clear_memory)
+        print(f"Seeded {len(traders)} traders from {args.seed}")
+    else:
+        reset_traders()
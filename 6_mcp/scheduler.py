@@ -0,0 +1,128 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable
+from rate_limit import TokenBucket
+
+SKIP = "skip"
+CATCH_UP = "catch_up"
+
+
+class Job:
+    """
+    A coroutine to run every `every` seconds.
+
+    jitter adds up to that many random seconds to each start, so jobs with the same cadence
+    don't all hit the model providers at once. A run that takes longer than deadline seconds
+    is cancelled. A run that fails or times out is retried after retry_after seconds rather
+    than waiting for the next slot. When runs fall behind schedule, on_missed="skip" jumps to the
+    next future slot, and on_missed="catch_up" runs once straight away for all the missed slots.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[], Awaitable],
+        every: float,
+        jitter: float = 0.0,
+        deadline: float | None = None,
+        retry_after: float | None = None,
+        on_missed: str = SKIP,
+    ):
+        if on_missed not in (SKIP, CATCH_UP):
+            raise ValueError(f"on_missed must be {SKIP!r} or {CATCH_UP!r}, not {on_missed!r}")
+        self.name = name
+        self.run = run
+        self.every = every
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_after = retry_after
+        self.on_missed = on_missed
+        self.next_due = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.missed = 0
+
+
+class Scheduler:
+    """
+    Runs each job on its own cadence, so a slow or failing job never holds up the others.
+
+    Each job is driven by its own task, which sleeps until the job is due, waits for one of
+    max_concurrent slots, and runs it. A job never overlaps with itself. When a gate is given,
+    it is checked (in a worker thread) before each run, and runs are skipped while it is False
+    or while checking it raises.
+    When a rate limit is given, runs start no faster than it allows.
+    """
+
+    def __init__(
+        self, max_concurrent: int, gate: Callable[[], bool] | None = None, rate: TokenBucket | None = None
+    ):
+        self.jobs: list[Job] = []
+        self.gate = gate
+        self.rate = rate
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    def add(self, job: Job, start_in: float = 0.0) -> None:
+        job.next_due = time.monotonic() + start_in
+        self.jobs.append(job)
+
+    async def run_forever(self) -> None:
+        await asyncio.gather(*[self._drive(job) for job in self.jobs])
+
+    async def _drive(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(max(0.0, job.next_due - time.monotonic()) + random.uniform(0, job.jitter))
+            if self.gate and not await self._gate_open(job):
+                job.next_due = self._next_due(job, succeeded=True)
+                continue
+            succeeded = await self._execute(job)
+            job.next_due = self._next_due(job, succeeded)
+
+    async def _gate_open(self, job: Job) -> bool:
+        """Check the gate for this run; a gate that fails counts as closed."""
+        try:
+            if await asyncio.to_thread(self.gate):
+                return True
+            print(f"Skipping {job.name}: gate is closed")
+        except Exception as e:
+            print(f"Skipping {job.name}: error checking the gate: {e}")
+        return False
+
+    async def _execute(self, job: Job) -> bool:
+        async with self._slots:
+            if self.rate:
+                await self.rate.acquire()
+            job.runs += 1
+            try:
+                await asyncio.wait_for(job.run(), job.deadline)
+                return True
+            except TimeoutError:
+                job.timeouts += 1
+                print(f"Cancelled {job.name} after its {job.deadline:.0f}s deadline")
+            except Exception as e:
+                job.failures += 1
+                print(f"Error running {job.name}: {e}")
+            return False
+
+    def _next_due(self, job: Job, succeeded: bool) -> float:
+        now = time.monotonic()
+        due = job.next_due + job.every
+        if not succeeded and job.retry_after is not None:
+            due = min(due, now + job.retry_after)
+        if due >= now:
+            return due
+        missed = int((now - due) // job.every) + 1
+        job.missed += missed
+        if job.on_missed == CATCH_UP:
+            print(f"{job.name} is {missed} run(s) behind, catching up now")
+            return now
+        print(f"{job.name} is {missed} run(s) behind, skipping to the next slot")
+        return due + missed * job.every
+
+    def metrics(self) -> dict[str, dict[str, int]]:
+        return {
+            job.name: {"runs": job.runs, "failures": job.failures, "timeouts": job.timeouts, "missed": job.missed}
+            for job in self.jobs
+        }
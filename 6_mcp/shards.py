@@ -0,0 +1,21 @@
+import os
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# Which shard of the traders this process serves, when the trading floor runs several workers
+SHARD = int(os.getenv("TRADING_FLOOR_SHARD", "0"))
+SHARDS = int(os.getenv("TRADING_FLOOR_SHARDS", "1"))
+# How often each shard records that it is running; a shard silent for three beats is taken to be down
+HEARTBEAT_SECONDS = float(os.getenv("TRADING_FLOOR_HEARTBEAT_SECONDS", "30"))
+
+
+def shard_of(name: str, shards: int) -> int:
+    """The shard a trader's account belongs to; it never changes for a given number of shards"""
+    return zlib.crc32(name.lower().encode()) % shards
+
+
+def share_of(limit: int, shard: int, shards: int) -> int:
+    """This shard's part of a limit on the whole floor; the parts add up to the limit, so some may be 0"""
+    return limit // shards + (shard < limit % shards)
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from database import read_spans
+
+# Span types to aggregate for each grouping; "tool" covers MCP and function tools, including
+# the Researcher, whose time includes all of its own calls
+GROUPS = {
+    "tool": ["function", "mcp_tools"],
+    "model": ["generation", "response"],
+    "agent": ["agent"],
+}
+PERCENTILES = {"p50 s": 0.5, "p95 s": 0.95, "p99 s": 0.99}
+STATS_COLUMNS = ["Name", "Calls", *PERCENTILES, "Total s", "Input tokens", "Output tokens", "Errors"]
+
+
+def _span_frame(by: str = "tool", window: timedelta | None = None, name: str | None = None) -> pd.DataFrame:
+    since = (datetime.now(timezone.utc) - window).strftime("%Y-%m-%d %H:%M:%S") if window else None
+    df = pd.DataFrame(read_spans(since, name, GROUPS[by]))
+    if df.empty:
+        return df
+    if by == "tool":
+        # MCP tools are labelled with their server, as two servers may offer tools of the same name
+        tools = df["label"].where(df["type"] == "function", "list tools")
+        df["label"] = (df["server"] + ": " + tools).fillna(tools)
+    return df
+
+
+def span_percentiles(by: str = "tool", window: timedelta | None = None, name: str | None = None) -> pd.DataFrame:
+    """
+    Latency percentiles, total time, token usage and errors for each tool or model (or agent),
+    over the spans that started within the window, for one trader or all of them.
+    """
+    df = _span_frame(by, window, name)
+    if df.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    grouped = df.groupby(df["label"].fillna("unknown"))
+    stats = pd.DataFrame({
+        "Calls": grouped.size(),
+        **{column: grouped["duration"].quantile(q) for column, q in PERCENTILES.items()},
+        "Total s": grouped["duration"].sum(),
+        "Input tokens": grouped["input_tokens"].sum(min_count=1),
+        "Output tokens": grouped["output_tokens"].sum(min_count=1),
+        "Errors": grouped["error"].count(),
+    })
+    stats = stats.sort_values("Total s", ascending=False).rename_axis("Name").reset_index()
+    return stats[STATS_COLUMNS].round(3)
@@ -0,0 +1,91 @@
+import json
+import os
+import time
+from typing import Any
+from agents.mcp import MCPServer
+from dotenv import load_dotenv
+from mcp.types import CallToolResult
+
+load_dotenv(override=True)
+
+MEMO_TTL_SECONDS = float(os.getenv("MEMO_TTL_SECONDS", "60"))
+
+
+class ToolMemo:
+    """
+    Results of read-only MCP tool calls during one run, keyed by tool and arguments.
+
+    A tool is memoized only if its server declares it read-only (readOnlyHint). Any other
+    tool call counts as a write: it drops the memoized reads of the account named in its
+    arguments, or every memoized read if it names no account. Entries also expire after
+    MEMO_TTL_SECONDS, since the order book can fill orders in the background.
+    """
+
+    def __init__(self, ttl: float = MEMO_TTL_SECONDS):
+        self.ttl = ttl
+        self.read_only: set[tuple[str, str]] = set()
+        self._results: dict[str, tuple[float, str | None, CallToolResult]] = {}
+        self.calls = 0
+        self.saved = 0
+
+    def learn(self, server: MCPServer, tools) -> None:
+        self.read_only |= {
+            (server.name, tool.name) for tool in tools if tool.annotations and tool.annotations.readOnlyHint
+        }
+
+    @staticmethod
+    def _account(arguments: dict[str, Any] | None) -> str | None:
+        name = (arguments or {}).get("name")
+        return name.lower() if isinstance(name, str) else None
+
+    async def call(self, server: MCPServer, tool_name: str, arguments: dict[str, Any] | None) -> CallToolResult:
+        self.calls += 1
+        if (server.name, tool_name) not in self.read_only:
+            result = await server.call_tool(tool_name, arguments)
+            self.invalidate(self._account(arguments))
+            return result
+        key = f"{server.name}:{tool_name}:{json.dumps(arguments, sort_keys=True)}"
+        cached = self._results.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.saved += 1
+            return cached[2]
+        result = await server.call_tool(tool_name, arguments)
+        if not result.isError:
+            self._results[key] = (time.monotonic() + self.ttl, self._account(arguments), result)
+        return result
+
+    def invalidate(self, account: str | None = None) -> None:
+        if account is None:
+            self._results.clear()
+        else:
+            self._results = {key: entry for key, entry in self._results.items() if entry[1] != account}
+
+
+class MemoizedMCPServer(MCPServer):
+    """Lends a connected server to one run, answering repeated read-only calls from the run's ToolMemo."""
+
+    def __init__(self, server: MCPServer, memo: ToolMemo):
+        self.server = server
+        self.memo = memo
+
+    @property
+    def name(self) -> str:
+        return self.server.name
+
+    @property
+    def session(self):
+        return self.server.session
+
+    async def connect(self):
+        pass
+
+    async def cleanup(self):
+        pass
+
+    async def list_tools(self, *args, **kwargs):
+        tools = await self.server.list_tools(*args, **kwargs)
+        self.memo.learn(self.server, tools)
+        return tools
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any] | None) -> CallToolResult:
+        return await self.memo.call(self.server, tool_name, arguments)
@@ -1,5 +1,6 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from datetime import datetime, timezone
+from log_sink import logs, spans, write_log
 import secrets
 import string
 
@@ -67,9 +68,49 @@ class LogTracer(TracingProcessor):
             if span.error:
                 message += f" {span.error}"
             write_log(name, type, message)
+            self.record(name, span)
+
+    def record(self, name: str, span) -> None:
+        """Queue the span's timing, and token usage for model calls, for the spans table."""
+        if not span.started_at or not span.ended_at:
+            return
+        started = datetime.fromisoformat(span.started_at)
+        ended = datetime.fromisoformat(span.ended_at)
+        data = span.span_data
+        type = data.type if data else "span"
+        label = server = usage = None
+        if type == "generation":
+            label, usage = data.model, data.usage
+        elif type == "response" and data.response:
+            label, usage = data.response.model, data.response.usage and data.response.usage.model_dump()
+        elif type == "function":
+            label, server = data.name, (data.mcp_data or {}).get("server")
+        elif type == "mcp_tools":
+            label = server = data.server
+        elif hasattr(data, "name"):
+            label = data.name
+        usage = usage or {}
+        utc = "%Y-%m-%d %H:%M:%S.%f"
+        spans.write((
+            name,
+            span.trace_id,
+            span.span_id,
+            span.parent_id,
+            type,
+            label,
+            server,
+            started.astimezone(timezone.utc).strftime(utc),
+            ended.astimezone(timezone.utc).strftime(utc),
+            (ended - started).total_seconds(),
+            usage.get("input_tokens"),
+            usage.get("output_tokens"),
+            span.error.get("message") if span.error else None,
+        ))
 
     def force_flush(self) -> None:
-        pass
+        logs.force_flush()
+        spans.force_flush()
 
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        logs.shutdown()
+        spans.shutdown()
\ No newline at end of file
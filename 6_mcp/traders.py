@@ -1,12 +1,11 @@
 from contextlib import AsyncExitStack
 from accounts_client import read_accounts_resource, read_strategy_resource
-from tracers import make_trace_id
-from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
+from checkpoints import Checkpoint, CheckpointedModel, CheckpointHooks
+from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, OpenAIProvider, trace
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import os
-import json
-from agents.mcp import MCPServerStdio
+from agents.mcp import MCPServer, MCPServerStdio
 from templates import (
     researcher_instructions,
     trader_instructions,
@@ -15,6 +14,10 @@ from templates import (
     research_tool,
 )
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+from mcp_pool import MCPServerPool, TraderMCPServer
+from rate_limit import RateLimitedModel, get_limiter
+from tool_memo import MemoizedMCPServer, ToolMemo
+from log_sink import write_log
 
 load_dotenv(override=True)
 
@@ -30,23 +33,32 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 MAX_TURNS = 30
 
-openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
-deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
-grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key)
-gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key)
+# Retries are left to RateLimitedModel, which backs off every caller of a provider together on a 429
+openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key, max_retries=0)
+deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key, max_retries=0)
+grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key, max_retries=0)
+gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key, max_retries=0)
+openai_provider = OpenAIProvider(openai_client=AsyncOpenAI(max_retries=0))
 
 
 def get_model(model_name: str):
+    """The model for this name, behind the rate limiter shared by all of its provider's models"""
     if "/" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
+        provider, model = "openrouter", OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
     elif "deepseek" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
+        provider, model = "deepseek", OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
     elif "grok" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=grok_client)
+        provider, model = "grok", OpenAIChatCompletionsModel(model=model_name, openai_client=grok_client)
     elif "gemini" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=gemini_client)
+        provider, model = "gemini", OpenAIChatCompletionsModel(model=model_name, openai_client=gemini_client)
     else:
-        return model_name
+        provider, model = "openai", openai_provider.get_model(model_name)
+    return RateLimitedModel(model, get_limiter(provider))
+
+
+async def read_resource(server: MCPServer, uri: str) -> str:
+    result = await server.session.read_resource(uri)
+    return result.contents[0].text
 
 
 async def get_researcher(mcp_servers, model_name) -> Agent:
@@ -71,6 +83,7 @@ class Trader:
         self.agent = None
         self.model_name = model_name
         self.do_trade = True
+        self.checkpoint: Checkpoint | None = None
 
     async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
         tool = await get_researcher_tool(researcher_mcp_servers, self.model_name)
@@ -83,22 +96,58 @@ class Trader:
         )
         return self.agent
 
-    async def get_account_report(self) -> str:
-        account = await read_accounts_resource(self.name)
-        account_json = json.loads(account)
-        account_json.pop("portfolio_value_time_series", None)
-        return json.dumps(account_json)
+    async def get_account_report(self, accounts_server: MCPServer | None = None) -> str:
+        if accounts_server:
+            return await read_resource(accounts_server, f"accounts://accounts_server/{self.name}")
+        return await read_accounts_resource(self.name)
+
+    async def get_strategy(self, accounts_server: MCPServer | None = None) -> str:
+        if accounts_server:
+            return await read_resource(accounts_server, f"accounts://strategy/{self.name}")
+        return await read_strategy_resource(self.name)
 
     async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
-        self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
-        account = await self.get_account_report()
-        strategy = await read_strategy_resource(self.name)
-        message = (
-            trade_message(self.name, strategy, account)
-            if self.do_trade
-            else rebalance_message(self.name, strategy, account)
-        )
-        await Runner.run(self.agent, message, max_turns=MAX_TURNS)
+        # Repeated read-only account and market calls within this run are answered from the memo
+        memo = ToolMemo()
+        memoized_servers = [MemoizedMCPServer(server, memo) for server in trader_mcp_servers]
+        # The research and memory servers are shared, so they are told which trader each call is for
+        researcher_mcp_servers = [TraderMCPServer(server, self.name) for server in researcher_mcp_servers]
+        self.agent = await self.create_agent(memoized_servers, researcher_mcp_servers)
+        checkpoint = self.checkpoint
+        if checkpoint and checkpoint.resumed:
+            print(f"Resuming {self.name} after turn {checkpoint.turns} of {checkpoint.trace_id}")
+            input, max_turns = checkpoint.resume_input(), max(1, MAX_TURNS - checkpoint.turns)
+        else:
+            # Read through the trader's own accounts server (first in trader_mcp_server_params), so that
+            # one server process owns, and caches, each account
+            accounts_server = trader_mcp_servers[0]
+            account = await self.get_account_report(accounts_server)
+            strategy = await self.get_strategy(accounts_server)
+            input = (
+                trade_message(self.name, strategy, account)
+                if self.do_trade
+                else rebalance_message(self.name, strategy, account)
+            )
+            max_turns = MAX_TURNS
+        hooks = None
+        if checkpoint:
+            self.agent.model = CheckpointedModel(self.agent.model, checkpoint)
+            hooks = CheckpointHooks(checkpoint)
+        try:
+            await Runner.run(self.agent, input, max_turns=max_turns, hooks=hooks)
+        finally:
+            if memo.calls:
+                write_log(self.name, "function", f"Saved {memo.saved} of {memo.calls} tool round trips by memoizing reads")
+        if checkpoint:
+            checkpoint.finish()
+
+    def mcp_server_params(self) -> list[dict]:
+        return trader_mcp_server_params + researcher_mcp_server_params(self.name)
+
+    async def run_with_pooled_mcp_servers(self, pool: MCPServerPool):
+        trader_mcp_servers = pool.servers(trader_mcp_server_params)
+        researcher_mcp_servers = pool.servers(researcher_mcp_server_params(self.name))
+        await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
     async def run_with_mcp_servers(self):
         async with AsyncExitStack() as stack:
@@ -117,15 +166,21 @@ class Trader:
                 ]
                 await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
-    async def run_with_trace(self):
+    async def run_with_trace(self, pool: MCPServerPool | None = None):
         trace_name = f"{self.name}-trading" if self.do_trade else f"{self.name}-rebalancing"
-        trace_id = make_trace_id(f"{self.name.lower()}")
-        with trace(trace_name, trace_id=trace_id):
-            await self.run_with_mcp_servers()
-
-    async def run(self):
+        self.checkpoint = Checkpoint.resume_or_start(self.name, "trading" if self.do_trade else "rebalancing")
+        try:
+            with trace(trace_name, trace_id=self.checkpoint.trace_id):
+                if pool:
+                    await self.run_with_pooled_mcp_servers(pool)
+                else:
+                    await self.run_with_mcp_servers()
+        finally:
+            self.checkpoint = None
+
+    async def run(self, pool: MCPServerPool | None = None):
         try:
-            await self.run_with_trace()
+            await self.run_with_trace(pool)
         except Exception as e:
             print(f"Error running trader {self.name}: {e}")
         self.do_trade = not self.do_trade
@@ -1,9 +1,18 @@
 from traders import Trader
+from accounts_client import accounts_client
+from mcp_params import trader_mcp_server_params, use_shard
 from typing import List
 import asyncio
+import multiprocessing
+import time
 from tracers import LogTracer
 from agents import add_trace_processor
 from market import is_market_open
+from mcp_pool import MCPServerPool
+from scheduler import Job, Scheduler
+from rate_limit import TokenBucket, share_limits
+from database import delete_floor_heartbeat, read_traders, write_floor_heartbeat, write_traders
+from shards import HEARTBEAT_SECONDS, shard_of, share_of
 from dotenv import load_dotenv
 import os
 
@@ -13,6 +22,13 @@ RUN_EVERY_N_MINUTES = int(os.getenv("RUN_EVERY_N_MINUTES", "60"))
 RUN_EVEN_WHEN_MARKET_IS_CLOSED = (
     os.getenv("RUN_EVEN_WHEN_MARKET_IS_CLOSED", "false").strip().lower() == "true"
 )
+SCHEDULE_JITTER_SECONDS = float(os.getenv("SCHEDULE_JITTER_SECONDS", "30"))
+TRADER_DEADLINE_MINUTES = float(os.getenv("TRADER_DEADLINE_MINUTES", "20"))
+TRADER_RETRY_MINUTES = float(os.getenv("TRADER_RETRY_MINUTES", "5"))
+MISSED_RUN_POLICY = os.getenv("MISSED_RUN_POLICY", "skip")
+MAX_CONCURRENT_TRADERS = int(os.getenv("MAX_CONCURRENT_TRADERS", "4"))
+MAX_TRADER_RUNS_PER_MINUTE = float(os.getenv("MAX_TRADER_RUNS_PER_MINUTE", "0"))
+TRADING_FLOOR_WORKERS = int(os.getenv("TRADING_FLOOR_WORKERS", "1"))
 USE_MANY_MODELS = os.getenv("USE_MANY_MODELS", "false").strip().lower() == "true"
 
 names = ["Warren", "George", "Ray", "Cathie"]
@@ -31,24 +47,115 @@ else:
     short_model_names = ["GPT 4o mini"] * 4
 
 
-def create_traders() -> List[Trader]:
-    traders = []
-    for name, lastname, model_name in zip(names, lastnames, model_names):
-        traders.append(Trader(name, lastname, model_name))
-    return traders
+def register_default_traders():
+    """Fill an empty trader registry with the four default traders"""
+    if not read_traders(enabled_only=False):
+        write_traders([
+            {"name": name, "lastname": lastname, "model_name": model_name, "short_model_name": short_model_name}
+            for name, lastname, model_name, short_model_name in zip(names, lastnames, model_names, short_model_names)
+        ])
 
 
-async def run_every_n_minutes():
-    add_trace_processor(LogTracer())
-    traders = create_traders()
+def registered_traders(shard: int = 0, shards: int = 1) -> List[dict]:
+    """The enabled traders in the registry that belong to this shard"""
+    register_default_traders()
+    return [trader for trader in read_traders() if shard_of(trader["name"], shards) == shard]
+
+
+def create_traders(shard: int = 0, shards: int = 1) -> List[Trader]:
+    return [
+        Trader(trader["name"], trader["lastname"], trader["model_name"])
+        for trader in registered_traders(shard, shards)
+    ]
+
+
+def minutes_between_runs(trader: dict) -> float:
+    """The trader's cadence from the registry, else RUN_EVERY_N_MINUTES_<NAME>, else RUN_EVERY_N_MINUTES"""
+    if trader.get("run_every_n_minutes"):
+        return trader["run_every_n_minutes"]
+    return float(os.getenv(f"RUN_EVERY_N_MINUTES_{trader['name'].upper()}", RUN_EVERY_N_MINUTES))
+
+
+async def run_trader(trader: Trader, pool: MCPServerPool):
+    """One scheduled run. Unlike Trader.run this raises on failure, so the scheduler can retry."""
+    saved = await pool.prepare([trader.mcp_server_params()])
+    print(f"Reusing MCP servers saved {saved:.1f}s of startup for {trader.name}")
+    # Anything in this process that uses the accounts client shares the pooled accounts server
+    accounts_client.use_server(pool.servers(trader_mcp_server_params[:1])[0])
+    await trader.run_with_trace(pool)
+    trader.do_trade = not trader.do_trade
+
+
+def create_scheduler(shard: int, shards: int, pool: MCPServerPool) -> Scheduler:
+    """
+    A scheduler for one shard of the registered traders. The floor-wide limits on concurrent
+    runs and on runs started per minute are split between the shards, so that together they
+    never exceed them.
+    """
+    gate = None if RUN_EVEN_WHEN_MARKET_IS_CLOSED else is_market_open
+    rate = TokenBucket(MAX_TRADER_RUNS_PER_MINUTE / shards / 60) if MAX_TRADER_RUNS_PER_MINUTE else None
+    slots = share_of(MAX_CONCURRENT_TRADERS, shard, shards)
+    if not slots:
+        print(f"Shard {shard + 1} of {shards} gets none of the {MAX_CONCURRENT_TRADERS} concurrent runs, "
+              f"so its traders won't run; use no more workers than MAX_CONCURRENT_TRADERS")
+    scheduler = Scheduler(slots, gate=gate, rate=rate)
+    for record in registered_traders(shard, shards):
+        trader = Trader(record["name"], record["lastname"], record["model_name"])
+        job = Job(
+            trader.name,
+            lambda trader=trader: run_trader(trader, pool),
+            every=minutes_between_runs(record) * 60,
+            jitter=SCHEDULE_JITTER_SECONDS,
+            deadline=TRADER_DEADLINE_MINUTES * 60,
+            retry_after=TRADER_RETRY_MINUTES * 60,
+            on_missed=MISSED_RUN_POLICY,
+        )
+        scheduler.add(job)
+    return scheduler
+
+
+async def heartbeat(shard: int):
+    """Record every HEARTBEAT_SECONDS that this shard is running, so reset.py can refuse to run meanwhile"""
     while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+        try:
+            write_floor_heartbeat(shard, os.getpid(), time.time())
+        except Exception as e:
+            print(f"Error recording the heartbeat of shard {shard + 1}: {e}")
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+
+
+async def run_every_n_minutes(shard: int = 0, shards: int = 1):
+    add_trace_processor(LogTracer())
+    pool = MCPServerPool()
+    scheduler = create_scheduler(shard, shards, pool)
+    print(f"Shard {shard + 1} of {shards} is scheduling {len(scheduler.jobs)} traders")
+    beating = asyncio.create_task(heartbeat(shard))
+    try:
+        await scheduler.run_forever()
+    finally:
+        beating.cancel()
+        delete_floor_heartbeat(shard)
+        await pool.close()
+
+
+def run_shard(shard: int, shards: int):
+    use_shard(shard, shards)
+    share_limits(shard, shards)
+    asyncio.run(run_every_n_minutes(shard, shards))
+
+
+def run_workers(workers: int = TRADING_FLOOR_WORKERS):
+    """Run the floor in one process per shard, each with its own MCP servers and event loop"""
+    if workers == 1:
+        run_shard(0, 1)
+        return
+    processes = [multiprocessing.Process(target=run_shard, args=(shard, workers)) for shard in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
 
 
 if __name__ == "__main__":
-    print(f"Starting scheduler to run every {RUN_EVERY_N_MINUTES} minutes")
-    asyncio.run(run_every_n_minutes())
+    print(f"Starting scheduler to run every {RUN_EVERY_N_MINUTES} minutes on {TRADING_FLOOR_WORKERS} worker(s)")
+    run_workers()